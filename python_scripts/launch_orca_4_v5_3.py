@@ -7,27 +7,57 @@ for positive charges, use either the number or p (e.g. 1, 2, p1, p2)
 for negative charges, use m or n (e.g. m1, m2, n1, n2)
 
 the orca keywords will either be taken from a set of default files found at {default_path}
-or a local file specified as an argument.
+or a local file specified as an argument. Default files can also be specified by name (e.g. opt_default)
 
-the memory will either be estimated automatically based on the molecular structures of the subjobs
+the memory will either be estimated automatically from the number of basis functions of the subjobs
 or specified as an argument
 
 the job time will either be specified as an argument (recommended) or set to a default value
 
+if process_orca_4 -calibrate has recorded enough finished jobs of the same basis set and job type,
+the job time is instead predicted from those jobs, with a margin, and the memory reuses the %maxcore they requested.
+This only repeats earlier requests: jobs that ran out of memory are never recorded, so it cannot tell whether less
+would have sufficed
+
 if the '-scan' or '-s' flag is used, an interactive scan session is launched.
 
 if the '-batchscan' or '-bs' flag is used, an interactive scan where all the subjobs scan the same space is launched.
 
+if a .json or .csv scan spec is passed as an argument, the scan of every subjob is read from it instead of the
+interactive session. It maps molecule names (or patterns of names, e.g. cat_*) to the atoms of the scan,
+either as indices or as an element/connectivity pattern (e.g. Pd-P), and the start, end, and step of the scan.
+Every subjob is validated at once and every error is reported before anything is written
+
 if the '-write' or '-w' flag is usued, the job is written but not launched.
 
+if the '-array' or '-a' flag is used, each subjob is run as its own task of a SLURM job array
+instead of one after another in a single job. The number of tasks running at once can be capped with %N (e.g. %4)
+
+if the '-pack' or '-p' flag is used, the walltime of each subjob is estimated and the subjobs are packed into
+as few SLURM jobs as possible, each of which is predicted to finish within the job time. A pack that cannot
+(a single subjob predicted to take longer) is given its predicted walltime as its job time
+
+if the '-bulk' or '-b' flag is used, the names and geometries of the .xyz files are read in a thread pool for large
+screening sets, and every malformed file is skipped and collected into one report instead of prompting for each
+
+if the '-resume' or '-r' flag is used, subjobs whose .out file terminated normally are left out,
+and the others restart from their last geometry and read the orbitals of their old .gbw file
+
+if the '-workflow' or '-wf' flag is used, several settings files are given in order, one per stage (e.g. an optimization
+then a single point). Every stage is a job array, and each later stage is written in its own directory named after its
+settings file. Each subjob of a stage starts from the final geometry and orbitals of the same subjob in the previous
+stage as soon as that subjob terminates normally (SLURM aftercorr dependencies)
+
 While creating the .inp files, this script renames the .xyz files to {molecule_name}_{charge}_{spin}_in.xyz
 if they do not already end in '_in.xyz'
 
 Lastly, this script creates a batch SLURM job using the memory, job time, and parallelization data provided
 
-This script takes up to three optional user-specified system arguments:
- the job time, the memory per core, a settings file
-It also takes two optional flags: '-scan' or '-write' (also '-s' and '-w')
+This script takes up to four optional user-specified system arguments:
+ the job time, the memory per core, a settings file, and a scan spec
+It also takes the optional flags '-scan', '-write', '-array', '-pack', '-resume', '-workflow', and '-bulk'
+(also '-s', '-w', '-a', '-p', '-r', '-wf', and '-b'), and more settings files for the stages of a workflow
+and an array cap
 This script requires no particular order for its flags and arguments
 
 The shell script which launches this script passes the user email (sys.argv[1])
@@ -65,12 +95,61 @@ version Initials    Date            Summary
 5.3     ARS         15-Aug-2023     if -bs, then requires choose_atoms to have the same number. duplicate arguments
 5.3                                 now throw an error. User can override MAX_STEPS error in scans. User Specified
 5.3                                 memory now has a special string in summarize(). summarize() retweaked.
+5.4     ARS         16-Oct-2026     Added -array, which runs each subjob as a task of a SLURM job array with its own
+5.4                                 staging and copy-back, and %N, which caps the number of tasks running at once
+5.5     ARS         16-Oct-2026     Added -pack, which estimates the walltime of each subjob and packs the subjobs
+5.5                                 largest first into SLURM jobs that fit the job time
+5.6     ARS         16-Oct-2026     memory and job time defaults are predicted from the past jobs recorded by
+5.6                                 process_orca_4 -calibrate when there are enough of them (CostModel)
+5.7     ARS         16-Oct-2026     memory and cost are estimated from the number of basis and auxiliary functions,
+5.7                                 which are counted with per element tables of the basis sets, instead of from atoms
+5.7                                 per row
+5.8     ARS         16-Oct-2026     after each subjob, only the files that are new or changed since the last copy are
+5.8                                 copied back, and a final sync copies anything that was missed
+5.9     ARS         16-Oct-2026     each subjob only stages the files its .inp file reads (the .inp file, its xyzfile,
+5.9                                 and any %moinp guess) in its own scratch directory just before it runs, which is
+5.9                                 removed afterwards
+6.0     ARS         16-Oct-2026     Added -resume, which leaves out finished subjobs and restarts the others from their
+6.0                                 last geometry with the orbitals of their old .gbw file (MORead)
+6.1     ARS         16-Oct-2026     Added -workflow, which chains stages with different settings files as job arrays
+6.1                                 with aftercorr dependencies, and default settings files can be given by name
+6.2     ARS         16-Oct-2026     scans can be read from a .json or .csv scan spec, whose atoms are indices or
+6.2                                 element/connectivity patterns, instead of the interactive scan session
+6.3     ARS         16-Oct-2026     Replaced Atom and the raw lines of subjobs with Geometry, which holds atomic
+6.3                                 numbers and coordinates as numpy arrays and measures many distances, angles, and
+6.3                                 (now signed) dihedrals at once. The scan summary shows the current value of
+6.3                                 every scan
+6.4     ARS         16-Oct-2026     Added -bulk, which reads the .xyz files in a thread pool and reports every malformed
+6.4                                 file at once. .inp files are written in a thread pool and the SLURM script no longer
+6.4                                 rereads them
+6.5     ARS         16-Oct-2026     QM hessian memory is no longer divided by the number of cores, is capped at
+6.5                                 MAX_ALLOWED_MEM and never falls below the earlier per heavy atom estimate
+6.6     ARS         16-Oct-2026     each subjob copies its results back once, dropping the sync that repeated the copy
+6.7     ARS         16-Oct-2026     packs predicted to exceed the job time are submitted with their predicted walltime
+6.8     ARS         16-Oct-2026     the default memory from -calibrate records is labelled as reusing earlier %maxcore
+6.8                                 requests, since jobs that ran out of memory are never recorded
+6.9     ARS         16-Oct-2026     memory estimates drop the per heavy atom floor for a 500 MB minimum, and the QM
+6.9                                 hessian term carries a 1.5x margin
+7.0     ARS         16-Oct-2026     auxiliary basis sets (e.g. def2/J) listed before the orbital basis set are no longer
+7.0                                 taken as the basis set
+7.1     ARS         16-Oct-2026     a subjob's scratch directory is only removed if its results were copied back
+7.2     ARS         16-Oct-2026     each subjob copies back only the files that are new or changed since it started, and
+7.2                                 the final sync is an exit trap that copies back what the current subjob missed,
+7.2                                 including when the job is killed at its job time
+7.3     ARS         16-Oct-2026     covalent radii cover every element up to Rn, so bonds to metals like Zr, Mo, W,
+7.3                                 and Hg are no longer found with a default radius
 """
 version = edit_history.strip().split('\n')[-1].split()[0]
 
 import os
 import sys
 import re
+import json
+import csv
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+import shutil
+import copy
 import numpy as np
 
 
@@ -85,11 +164,27 @@ class Parent(object):
         self.name = job_name
 
         self.time = None
+        self.custom_time = False
         self.memory_per_core = None
         self.custom_memory = False
+        self.reused_memory = False
+        self.predicted_time = False
         self.settings_path = None
+        self.settings_paths = []
         self.scan = False
         self.batch_scan = False
+        self.scan_spec = None
+        self.array = False
+        self.array_cap = None
+        self.pack = False
+        self.resume = False
+        self.bulk = False
+
+        # the parent is the first stage of a workflow, and runs in the working directory
+        self.workflow = False
+        self.stage = 1
+        self.directory = '.'
+        self.previous_stage = None
 
         self.parse_args()
 
@@ -104,7 +199,8 @@ class Parent(object):
         """Standard error message and exit command"""
         if error_message:
             print(f'Error: {error_message}')
-        print('Usage: launch_orca_4 [d:hh:mm:ss] [nM] [filename] [-scan] [-write]')
+        print('Usage: launch_orca_4 [d:hh:mm:ss] [nM] [filename] [scan_spec] [-scan] [-write] [-array] [%N] [-pack]'
+              ' [-resume] [-workflow] [-bulk]')
         print('Use "launch_orca_4 -help" for the manual')
         sys.exit(1)
 
@@ -119,6 +215,7 @@ class Parent(object):
                 if self.time is None:
                     if self.is_time(arg):
                         self.time = arg
+                        self.custom_time = True
                     else:
                         self.generate_std_error(f'Error! {arg} contains a ":" but is not a valid time string!')
                 else:
@@ -134,11 +231,20 @@ class Parent(object):
                 else:
                     self.generate_std_error(f'Error! Two memory arguments: {arg} and {self.time}')
 
-            elif os.path.exists(arg):
-                if self.settings_path is None:
-                    self.settings_path = arg
+            # a scan spec replaces the interactive scan session, so it implies -scan
+            elif os.path.isfile(arg) and arg.lower().endswith(('.json', '.csv')):
+                if self.scan_spec is None:
+                    self.scan = True
+                    self.scan_spec = arg
                 else:
-                    self.generate_std_error(f'Error! Two settings file arguments: {arg} and {self.time}')
+                    self.generate_std_error(f'Error! Two scan specs: {arg} and {self.scan_spec}')
+
+            # default settings files can also be given by name (e.g. opt_default)
+            # the later stages of a workflow are written in directories with the same names as their settings files
+            elif os.path.isfile(arg):
+                self.settings_paths.append(arg)
+            elif os.path.isfile(os.path.join(default_path, arg)):
+                self.settings_paths.append(os.path.join(default_path, arg))
 
             # note that '-s -bs' causes a batch scan, which while redundant, is probably what the user wanted.
             elif arg.lower() in ('-s', '-scan'):
@@ -150,41 +256,229 @@ class Parent(object):
             elif arg.lower() in ('-w', '-write'):
                 # This is handled in the shell file
                 print(f'Executing {__file__} in write mode')
+
+            # %N caps the number of array tasks running at once, so it implies -array
+            elif arg.lower() in ('-a', '-array'):
+                self.array = True
+            elif arg.startswith('%'):
+                if self.array_cap is None:
+                    if arg[1:].isdigit() and int(arg[1:]) > 0:
+                        self.array = True
+                        self.array_cap = int(arg[1:])
+                    else:
+                        self.generate_std_error(f"Error! {arg} starts with '%' but isn't a positive integer cap!")
+                else:
+                    self.generate_std_error(f'Error! Two array caps: {arg} and %{self.array_cap}')
+
+            elif arg.lower() in ('-p', '-pack'):
+                # This is also handled in the shell file
+                self.pack = True
+            elif arg.lower() in ('-b', '-bulk'):
+                self.bulk = True
+            elif arg.lower() in ('-r', '-resume'):
+                self.resume = True
+            elif arg.lower() in ('-wf', '-workflow'):
+                # This is also handled in the shell file
+                self.workflow = True
             elif arg.lower() in ('-v', '-version'):
                 print(f'launch_orca_4 version {version}')
                 sys.exit(0)
             else:
                 self.generate_std_error(f'Error: {arg} not recognized')
 
+        if self.array and self.pack:
+            self.generate_std_error('Error! -array and -pack cannot be used together')
+        if self.batch_scan and self.scan_spec is not None:
+            self.generate_std_error('Error! -batchscan cannot be used with a scan spec, which sets every scan')
+        # a scan restarted from its last geometry would scan from the wrong starting point
+        if self.resume and self.scan:
+            self.generate_std_error('Error! -resume cannot be used with scans')
+
+        # several settings files are only allowed as the stages of a workflow, whose later stages are named after them
+        if self.workflow:
+            stage_names = [os.path.basename(path) for path in self.settings_paths[1:]]
+            if len(self.settings_paths) < 2:
+                self.generate_std_error('Error! -workflow needs a settings file for each of at least two stages')
+            elif len(set(stage_names)) < len(stage_names):
+                self.generate_std_error('Error! The settings files of the later stages of a workflow need different '
+                                        'names')
+            elif self.scan or self.resume or self.pack:
+                self.generate_std_error('Error! -workflow cannot be used with scans, -resume, or -pack')
+            # every stage is a job array so that each subjob moves on as soon as it finishes
+            self.array = True
+        elif len(self.settings_paths) > 1:
+            self.generate_std_error(f'Error! Two settings file arguments: {self.settings_paths[0]} and '
+                                    f'{self.settings_paths[1]}')
+        if self.settings_paths:
+            self.settings_path = self.settings_paths[0]
+
+    @staticmethod
+    def time_to_hours(time_string):
+        """converts a SLURM time string (mm, mm:ss, hh:mm:ss, or d:hh:mm:ss) to hours"""
+        parts = [int(part) for part in time_string.split(':')]
+        if len(parts) == 1:
+            return parts[0] / 60
+        # pads the string to d:hh:mm:ss
+        days, hours, minutes, seconds = [0] * (4 - len(parts)) + parts
+        return days * 24 + hours + minutes / 60 + seconds / 3600
+
+
+class Geometry(object):
+    """Holds the atoms of an .xyz file as numpy arrays, which are parsed in bulk.
+    codes holds the element of each atom as its atomic number and coordinates is an (N, 3) array in angstroms.
+    Distances, angles, and dihedrals are measured on arrays of points with a leading axis for each measurement,
+    so any number of atom tuples from any number of geometries can be measured with a single call"""
+
+    SYMBOLS = ('X', 'H', 'He', 'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne', 'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar',
+               'K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr',
+               'Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe',
+               'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu',
+               'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn')
+    # covalent radii in angstroms of every element in SYMBOLS (Cordero et al. 2008, low spin for Mn, Fe, and Co).
+    # The dummy atom X has none and is never bonded
+    RADII = {'H': 0.31, 'He': 0.28, 'Li': 1.28, 'Be': 0.96, 'B': 0.84, 'C': 0.76, 'N': 0.71, 'O': 0.66, 'F': 0.57,
+             'Ne': 0.58, 'Na': 1.66, 'Mg': 1.41, 'Al': 1.21, 'Si': 1.11, 'P': 1.07, 'S': 1.05, 'Cl': 1.02, 'Ar': 1.06,
+             'K': 2.03, 'Ca': 1.76, 'Sc': 1.70, 'Ti': 1.60, 'V': 1.53, 'Cr': 1.39, 'Mn': 1.39, 'Fe': 1.32, 'Co': 1.26,
+             'Ni': 1.24, 'Cu': 1.32, 'Zn': 1.22, 'Ga': 1.22, 'Ge': 1.20, 'As': 1.19, 'Se': 1.20, 'Br': 1.20,
+             'Kr': 1.16, 'Rb': 2.20, 'Sr': 1.95, 'Y': 1.90, 'Zr': 1.75, 'Nb': 1.64, 'Mo': 1.54, 'Tc': 1.47,
+             'Ru': 1.46, 'Rh': 1.42, 'Pd': 1.39, 'Ag': 1.45, 'Cd': 1.44, 'In': 1.42, 'Sn': 1.39, 'Sb': 1.39,
+             'Te': 1.38, 'I': 1.39, 'Xe': 1.40, 'Cs': 2.44, 'Ba': 2.15, 'La': 2.07, 'Ce': 2.04, 'Pr': 2.03,
+             'Nd': 2.01, 'Pm': 1.99, 'Sm': 1.98, 'Eu': 1.98, 'Gd': 1.96, 'Tb': 1.94, 'Dy': 1.92, 'Ho': 1.92,
+             'Er': 1.89, 'Tm': 1.90, 'Yb': 1.87, 'Lu': 1.87, 'Hf': 1.75, 'Ta': 1.70, 'W': 1.62, 'Re': 1.51,
+             'Os': 1.44, 'Ir': 1.41, 'Pt': 1.36, 'Au': 1.36, 'Hg': 1.32, 'Tl': 1.45, 'Pb': 1.46, 'Bi': 1.48,
+             'Po': 1.40, 'At': 1.50, 'Rn': 1.50}
+    BOND_TOLERANCE = 0.4
+    # precomputed lookups of atomic numbers by uppercase symbol, and of radii by atomic number.
+    # Every element must have a radius, so a symbol added without one fails here instead of being misbonded
+    CODES = dict(zip(map(str.upper, SYMBOLS), range(len(SYMBOLS))))
+    RADIUS_TABLE = np.array([np.nan] + list(map(RADII.__getitem__, SYMBOLS[1:])))
+
+    def __init__(self, codes, coordinates):
+        self.codes = codes
+        self.coordinates = coordinates
+        self.n_atoms = len(codes)
+
+    @classmethod
+    def from_lines(cls, xyz_lines):
+        """parses the first frame of the lines of an .xyz file, skipping blank lines.
+        Raises ValueError if the lines are not a valid .xyz file"""
+
+        try:
+            n_atoms = int(xyz_lines[0])
+        except (IndexError, ValueError):
+            raise ValueError('the first line must be the number of atoms')
+        atom_lines = [line.split() for line in xyz_lines[2:] if line.strip()][:n_atoms]
+        if len(atom_lines) < n_atoms or any(len(fields) < 4 for fields in atom_lines):
+            raise ValueError(f'expected {n_atoms} lines of an element and three coordinates')
+
+        fields = np.array([fields[:4] for fields in atom_lines], dtype=str).reshape(n_atoms, 4)
+        unknown = sorted({symbol for symbol in fields[:, 0] if symbol.upper() not in cls.CODES})
+        if unknown:
+            raise ValueError(f'unknown elements {", ".join(unknown)}')
+        codes = np.array([cls.CODES[symbol.upper()] for symbol in fields[:, 0]], dtype=np.int64)
+        coordinates = fields[:, 1:].astype(float)
+
+        return cls(codes, coordinates)
+
+    @property
+    def symbols(self):
+        """the element symbol of each atom"""
+        return [self.SYMBOLS[code] for code in self.codes]
+
+    def composition(self):
+        """returns the number of atoms of each element"""
+        codes, counts = np.unique(self.codes, return_counts=True)
+        return {self.SYMBOLS[code]: int(count) for code, count in zip(codes, counts)}
+
+    def points(self, atom_tuples):
+        """returns the coordinates of a list of atom tuples of the same length k as an (M, k, 3) array.
+        Raises IndexError if an index is not an atom"""
+        atom_tuples = np.asarray(atom_tuples, dtype=np.int64)
+        if atom_tuples.size and (atom_tuples.min() < 0 or atom_tuples.max() >= self.n_atoms):
+            raise IndexError(f'atom indices must be between 0 and {self.n_atoms - 1}')
+        return self.coordinates[atom_tuples]
+
+    def bonds(self):
+        """returns a boolean (N, N) matrix of which atoms are bonded.
+        Atoms are bonded if they are closer than the sum of their covalent radii plus BOND_TOLERANCE"""
+        radii = self.RADIUS_TABLE[self.codes]
+
+        distances = np.linalg.norm(self.coordinates[:, np.newaxis] - self.coordinates[np.newaxis], axis=-1)
+        bonds = distances < radii[:, np.newaxis] + radii[np.newaxis] + self.BOND_TOLERANCE
+        np.fill_diagonal(bonds, False)
+
+        return bonds
+
+    @staticmethod
+    def find_distances(points):
+        """takes an (..., 2, 3) array of atom pairs and returns their distances in angstroms"""
+        return np.linalg.norm(points[..., 1, :] - points[..., 0, :], axis=-1)
+
+    @staticmethod
+    def find_angles(points):
+        """takes an (..., 3, 3) array of atom triples and returns their angles at the middle atom in degrees"""
+        v1 = points[..., 0, :] - points[..., 1, :]
+        v2 = points[..., 2, :] - points[..., 1, :]
+        cosines = np.sum(v1 * v2, axis=-1) / (np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1))
+
+        return np.degrees(np.arccos(np.clip(cosines, -1, 1)))
 
-class Atom(object):
-    """Holds atom data relevant to subjob properties.
-    Initializes using the xyz_lines from a subjob file"""
+    @staticmethod
+    def find_dihedrals(points):
+        """takes an (..., 4, 3) array of atom quadruples and returns their signed dihedrals in degrees (-180 to 180).
+        The sign follows the IUPAC convention, where a clockwise rotation looking down the middle bond is positive"""
+        b0 = points[..., 0, :] - points[..., 1, :]
+        b1 = points[..., 2, :] - points[..., 1, :]
+        b2 = points[..., 3, :] - points[..., 2, :]
+        b1 = b1 / np.linalg.norm(b1, axis=-1, keepdims=True)
+
+        # the outer bonds projected onto the plane perpendicular to the middle bond
+        v = b0 - np.sum(b0 * b1, axis=-1, keepdims=True) * b1
+        w = b2 - np.sum(b2 * b1, axis=-1, keepdims=True) * b1
+        x = np.sum(v * w, axis=-1)
+        y = np.sum(np.cross(b1, v) * w, axis=-1)
+
+        return np.degrees(np.arctan2(y, x))
+
+    @classmethod
+    def measure(cls, points):
+        """measures the distances, angles, or dihedrals of an (..., k, 3) array of 2, 3, or 4 atoms"""
+        measures = {2: cls.find_distances, 3: cls.find_angles, 4: cls.find_dihedrals}
+        return measures[points.shape[-2]](points)
 
-    def __init__(self, xyz_lines, index):
-        atom_info = xyz_lines[index + 2].split()
-        self.index = index
-        self.element = atom_info[0]
-        self.x = float(atom_info[1])
-        self.y = float(atom_info[2])
-        self.z = float(atom_info[3])
+    @staticmethod
+    def format_measurement(value, n_atoms):
+        """formats a distance (2 atoms), angle (3 atoms), or dihedral (4 atoms) with its units"""
+        if n_atoms == 2:
+            return f'{value:.2f} angstroms'
+        return f'{value:.1f} degrees'
 
 
 class ScanData(object):
     """Holds all data unique to scan jobs
     uses two interactive sessions to determine parameters
-    and always allows user to exit software by entering '0'"""
+    and always allows user to exit software by entering '0'
+    if a spec of (atom indices, scan start, scan end, n steps) from read_scan_spec() is passed, it is used instead"""
 
-    def __init__(self, subjob, reference=None):
+    def __init__(self, subjob, reference=None, spec=None):
         name = subjob.name
-        xyz_data = subjob.lines
+        geometry = subjob.geometry
+
+        if spec is not None:
+            atom_indices, self.scan_start, self.scan_end, self.n_steps = spec
+            self.atom_indices = list(atom_indices)
+            self.atom_symbols = [geometry.symbols[index] for index in self.atom_indices]
+            self.scan_codeblock = self.format_scan_codeblock()
+            self.scan_desc = self.format_scan_desc()
+            return
 
         # part of interactive session, so verbose
         print(PAGE_BREAK)
         print(f'    Setting up subjob {name}')
 
         # loops until user correctly enters two atoms or exits with 0
-        self.atom_list = self.choose_atoms(xyz_data, reference)
+        self.atom_indices = self.choose_atoms(geometry, reference)
+        self.atom_symbols = [geometry.symbols[index] for index in self.atom_indices]
         # loops until user correctly enters start, end, step_size or exits with 0
         self.scan_start, self.scan_end, self.n_steps = self.define_scan(reference)
 
@@ -193,9 +487,9 @@ class ScanData(object):
         print(f'    {self.scan_desc}')
 
     @staticmethod
-    def choose_atoms(xyz_data, reference):
+    def choose_atoms(geometry, reference):
         """Interactively choose the atoms for use in the scan
-        Returns an array of 2-4 atoms
+        Returns a list of 2-4 atom indices
         designed to loop indefinitely until valid input is entered
         at any time, '0' can be pressed to exit"""
 
@@ -207,62 +501,25 @@ class ScanData(object):
             """for handling number of atoms that don't match reference"""
             pass
 
-        def vector(a, b):
-            return np.array([a.x - b.x, a.y - b.y, a.z - b.z])
-
-        def find_distance(a1, a2):
-            return np.linalg.norm(vector(a1, a2))
-
-        def find_angle(a1, a2, a3):
-            v1 = vector(a2, a1)
-            v2 = vector(a2, a3)
-
-            radians = np.arccos(np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2)))
-
-            return np.degrees(radians)
-
-        def find_dihedral(a1, a2, a3, a4):
-            v1 = vector(a1, a2)
-            v2 = vector(a2, a3)
-            v3 = vector(a3, a4)
-
-            v1xv2 = np.cross(v1, v2)
-            v2xv3 = np.cross(v2, v3)
-            radians = np.arccos(np.dot(v1xv2, v2xv3) / (np.linalg.norm(v1xv2) * np.linalg.norm(v2xv3)))
-
-            return np.degrees(radians)
-
         while True:
             choice = input('    Please enter atom list as integers separated with spaces\n    > ')
             if choice == '0':
                 sys.exit(0)
             else:
                 try:
-                    index_list = map(int, choice.split())
-                    atom_list = [Atom(xyz_data, index) for index in index_list]
+                    atom_indices = [int(index) for index in choice.split()]
+                    points = geometry.points([atom_indices])
 
                     if reference:
-                        if len(atom_list) != len(reference.atom_list):
+                        if len(atom_indices) != len(reference.atom_indices):
                             raise AtomNumberMatchError
 
-                    if len(atom_list) == 2:
-                        a1, a2 = atom_list
-                        scan_type = f'{a1.element}-{a2.element}'
-                        scan_value = f'{find_distance(a1, a2):.2f} angstroms'
-
-                    elif len(atom_list) == 3:
-                        a1, a2, a3 = atom_list
-                        scan_type = f'{a1.element}-{a2.element}-{a3.element}'
-                        scan_value = f'{find_angle(a1, a2, a3):.1f} degrees'
-
-                    elif len(atom_list) == 4:
-                        a1, a2, a3, a4 = atom_list
-                        scan_type = f'{a1.element}-{a2.element}-{a3.element}-{a4.element}'
-                        scan_value = f'{find_dihedral(a1, a2, a3, a4):.1f} degrees'
-
-                    else:
+                    if not 2 <= len(atom_indices) <= 4:
                         raise AtomNumberError
 
+                    scan_type = '-'.join(geometry.symbols[index] for index in atom_indices)
+                    scan_value = Geometry.format_measurement(Geometry.measure(points)[0], len(atom_indices))
+
                     print(f"""
     You have selected a {scan_type} scan.
     These atoms are currently at {scan_value}.
@@ -271,7 +528,7 @@ class ScanData(object):
                     if choice == '0':
                         sys.exit(0)
                     elif choice == 'y':
-                        return atom_list
+                        return atom_indices
 
                 except (ValueError, IndexError):
                     print('    Error: Invalid input. Try again or enter "0" to quit.')
@@ -289,7 +546,6 @@ class ScanData(object):
 
         if reference is None:
             MAX_STEPS = 30
-            TOLERANCE = 1e-5
 
             while True:
                 scan_info = input(
@@ -304,21 +560,10 @@ class ScanData(object):
 
                     # determines number of steps and throws an error if 0 or excessive
                     # scan_end is reevaluated in n_steps does not come out as an int
-                    n_steps = 0
                     if scan_start == scan_end:
                         print('    Error: start distance and end distance cannot be the same')
                         continue
-                    # calculate number of steps
-                    n_steps = abs((scan_end - scan_start) / step_size) + 1
-
-                    # handles floating point errors
-                    if abs(n_steps - round(n_steps)) < TOLERANCE:
-                        n_steps = round(n_steps)
-                    # if difference is larger than tolerance, this is assumed to be because the user's
-                    # scan_start, scan_end, and step_size did not have an integer number of steps.
-                    else:
-                        n_steps = np.ceil(n_steps)
-                        scan_end = round(scan_start + n_steps * step_size, 3)
+                    scan_end, n_steps = ScanData.count_steps(scan_start, scan_end, step_size)
 
                     # checks for suspiciously long scans and asks for verification
                     if n_steps > MAX_STEPS:
@@ -346,10 +591,29 @@ class ScanData(object):
 
         return scan_start, scan_end, n_steps
 
+    @staticmethod
+    def count_steps(scan_start, scan_end, step_size):
+        """calculates the number of steps of a scan and returns the scan end and number of steps.
+        scan_end is reevaluated if the step size does not give an integer number of steps"""
+        TOLERANCE = 1e-5
+
+        n_steps = abs((scan_end - scan_start) / step_size) + 1
+
+        # handles floating point errors
+        if abs(n_steps - round(n_steps)) < TOLERANCE:
+            n_steps = round(n_steps)
+        # if difference is larger than tolerance, this is assumed to be because the user's
+        # scan_start, scan_end, and step_size did not have an integer number of steps.
+        else:
+            n_steps = np.ceil(n_steps)
+            scan_end = round(scan_start + n_steps * step_size, 3)
+
+        return scan_end, n_steps
+
     def format_scan_desc(self):
         """This function formats a description of the scan in plaintext"""
 
-        atoms = [f'{atom.element}{atom.index}' for atom in self.atom_list]
+        atoms = [f'{symbol}{index}' for symbol, index in zip(self.atom_symbols, self.atom_indices)]
         hyph_atoms = '-'.join(atoms)
         scan_desc = f'scanning {hyph_atoms} from {self.scan_start} to {self.scan_end} in {self.n_steps} steps'
 
@@ -358,21 +622,113 @@ class ScanData(object):
     def format_scan_codeblock(self):
         """This function formats the codeblock found in the .inp file"""
 
-        # atom_list already validated to be 2-4 items long
-        if len(self.atom_list) == 2:
+        # atom_indices already validated to be 2-4 items long
+        if len(self.atom_indices) == 2:
             s_type = 'B'
-        elif len(self.atom_list) == 3:
+        elif len(self.atom_indices) == 3:
             s_type = 'A'
-        elif len(self.atom_list) == 4:
+        elif len(self.atom_indices) == 4:
             s_type = 'D'
 
-        indices = ' '.join([str(atom.index) for atom in self.atom_list])
+        indices = ' '.join([str(index) for index in self.atom_indices])
 
         scan_codeblock = f'%geom scan {s_type} {indices} = {self.scan_start}, {self.scan_end}, {self.n_steps} end end\n'
 
         return scan_codeblock
 
 
+class CostModel(object):
+    """Predicts the cost and memory of subjobs from the finished jobs recorded by process_orca_4 -calibrate.
+    Jobs are grouped by basis set and job type (see describe_job()). Within a group, log(cost) is fit as a
+    linear function of log(N), where N is the number of basis functions (see count_functions()),
+    and predictions are raised by MARGIN standard deviations of the residuals, so about 95% of jobs finish in time.
+    Groups with fewer than MIN_SAMPLES jobs are not predicted"""
+
+    MIN_SAMPLES = 3
+    MARGIN = 1.645
+    # few samples can fit deceptively well, so the spread is never assumed to be smaller than this (about 20%)
+    MIN_DEVIATION = 0.2
+    # DFT cost scales between N^1 and N^4, and N^3 is assumed if the sizes of the samples are all the same
+    EXPONENT_RANGE = (1.0, 4.0)
+    DEFAULT_EXPONENT = 3.0
+    # %maxcore is extrapolated from the largest job of a group as N^2, plus 20%
+    MEMORY_EXPONENT = 2.0
+    MEMORY_MARGIN = 1.2
+
+    def __init__(self, samples):
+        self.n_samples = len(samples)
+
+        grouped = {}
+        for sample in samples:
+            key = describe_job(sample['commands'].split(), sample['scan_steps'] is not None)
+            # the cost of scans is per step
+            cost = sample['cost'] / (sample['scan_steps'] or 1)
+            if cost > 0:
+                grouped.setdefault(key, []).append((sample['composition'], cost, sample['maxcore']))
+
+        # the basis functions of every job of a group are counted at once
+        self.groups = {}
+        for key, jobs in grouped.items():
+            n_functions = count_functions([job[0] for job in jobs], key[0])
+            self.groups[key] = [(int(size), cost, maxcore)
+                                for size, (composition, cost, maxcore) in zip(n_functions, jobs)]
+
+    def fit(self, sizes, values):
+        """fits log(values) = a + b*log(sizes) and returns a, b, and the standard deviation of the residuals"""
+
+        x, y = np.log(sizes), np.log(values)
+        if np.ptp(x) > 0:
+            b = np.clip(np.polyfit(x, y, 1)[0], *self.EXPONENT_RANGE)
+        else:
+            b = self.DEFAULT_EXPONENT
+        a = np.mean(y - b * x)
+
+        residuals = y - (a + b * x)
+        deviation = np.sqrt(np.sum(residuals ** 2) / max(len(x) - 2, 1))
+        return a, b, max(deviation, self.MIN_DEVIATION)
+
+    def predict_cost(self, key, n_functions):
+        """returns the predicted cost of a job (or a single scan step) in cpu*hours,
+        or None if there are too few jobs"""
+
+        group = self.groups.get(key, [])
+        if len(group) < self.MIN_SAMPLES:
+            return None
+
+        a, b, deviation = self.fit([job[0] for job in group], [job[1] for job in group])
+        return float(np.exp(a + b * np.log(n_functions) + self.MARGIN * deviation))
+
+    def reuse_maxcore(self, key, n_functions):
+        """returns a %maxcore for a job in MB that earlier jobs requested, or None if there are too few jobs.
+        This is the smallest %maxcore that a job at least as large requested and finished with, or if there is none,
+        the %maxcore of the largest job scaled up to the size of this job.
+        Only jobs that finished are recorded, so this repeats earlier requests rather than measuring memory use"""
+
+        group = [job for job in self.groups.get(key, []) if job[2] is not None]
+        if len(group) < self.MIN_SAMPLES:
+            return None
+
+        sufficient = [maxcore for size, cost, maxcore in group if size >= n_functions]
+        if sufficient:
+            return min(sufficient)
+        size, cost, maxcore = max(group)
+        return int(np.ceil(maxcore * (n_functions / size) ** self.MEMORY_EXPONENT * self.MEMORY_MARGIN))
+
+
+class Pack(object):
+    """holds a group of subjobs which are run one after another in their own SLURM job"""
+
+    def __init__(self, name, time):
+        self.name = name
+        self.time = time
+        self.subjobs = []
+        self.walltime = 0.0
+
+    def add(self, subjob):
+        self.subjobs.append(subjob)
+        self.walltime += subjob.walltime
+
+
 class Subjob(object):
     """This object holds all of the attributes necessary for creating an orca .inp file
     which are specific to the subjob and not universal to the parent.
@@ -384,9 +740,11 @@ class Subjob(object):
         self.name = name
         self.charge = charge
         self.spin = spin
+        self.guess = None
 
         with open(file, 'r') as f:
-            self.lines = f.readlines()
+            self.geometry = Geometry.from_lines(f.readlines())
+        self.composition = self.geometry.composition()
 
 
 def print_nx2(array):
@@ -441,44 +799,214 @@ Please use a number key to choose a setting.""")
             print('Error: Not a valid setting')
 
 
-def count_atoms(xyz_data):
-    """reads lines from an xyz file and returns the number of atoms from each row of the periodic table.
-    Atoms in rows 6 and 7 are both partitioned into n6"""
+def match_atom_pattern(pattern, geometry):
+    """Finds every set of atoms of a Geometry that matches an element/connectivity pattern.
+    A pattern is a SMARTS-like chain of 2-4 atoms, e.g. 'Pd-P' (a bond), 'C-Pd-P' (an angle), or '*-C-C-*' (a dihedral).
+    Each atom is an element symbol or '*' for any element, optionally followed by ':n' for its number of bonded
+    neighbors (e.g. 'C:3'). Atoms joined by '-' must be bonded, and atoms joined by '~' may or may not be.
+    A chain and its reverse are the same scan, so only one of them is returned.
+    Returns a list of tuples of atom indices, and raises ValueError if the pattern is invalid"""
+
+    parts = re.split(r'([-~])', pattern.replace(' ', ''))
+    atom_tokens, joins = parts[0::2], parts[1::2]
+    if not 2 <= len(atom_tokens) <= 4:
+        raise ValueError(f'{pattern} must be a chain of 2 to 4 atoms')
+
+    queries = []
+    for token in atom_tokens:
+        match = re.fullmatch(r'(\*|[A-Z][a-z]?)(?::(\d+))?', token)
+        if match is None:
+            raise ValueError(f'"{token}" in {pattern} is not an element symbol or *, optionally followed by :n')
+        queries.append((match.group(1), None if match.group(2) is None else int(match.group(2))))
+
+    elements = geometry.symbols
+    bonds = geometry.bonds()
+    n_neighbors = bonds.sum(axis=1)
+    candidates = [
+        [index for index, element in enumerate(elements)
+         if symbol in ('*', element) and (neighbors is None or n_neighbors[index] == neighbors)]
+        for symbol, neighbors in queries
+    ]
+
+    # grows every chain one atom at a time
+    chains = [(index,) for index in candidates[0]]
+    for position in range(1, len(queries)):
+        chains = [chain + (index,) for chain in chains for index in candidates[position]
+                  if index not in chain and (joins[position - 1] == '~' or bonds[chain[-1], index])]
+
+    unique_chains = {}
+    for chain in chains:
+        unique_chains.setdefault(min(chain, chain[::-1]), chain)
+
+    return list(unique_chains.values())
 
-    atom_types = {
-        'n1': ('H', 'He'),
-        'n2': ('Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne'),
-        'n3': ('Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar'),
-        'n4': (
-            'K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr'),
-        'n5': ('Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe')
-    }
 
-    n_atoms = [0, 0, 0, 0, 0, 0]
+def read_scan_spec(spec_path, subjobs):
+    """Reads the scan of every subjob from a .json or .csv scan spec instead of the interactive scan session.
+    A .json spec maps molecule names to scans, e.g. {"cat_*": {"atoms": "Pd-P", "start": 2.3, "end": 3.3, "step": 0.1}}
+    A .csv spec has the columns molecule, atoms, start, end, and step.
+    Molecule names may be patterns (e.g. cat_*). A subjob uses the scan of its exact name if there is one,
+    otherwise the first pattern it matches.
+    The atoms of a scan are either indices (e.g. [0, 5] or "0 5") or an element/connectivity pattern (e.g. "Pd-P"),
+    which has to match exactly one set of atoms in each subjob.
+    Every subjob is validated, and every error is reported at once before exiting.
+    Returns a dictionary of subjob names to (atom indices, scan start, scan end, n steps) for ScanData"""
+    MAX_STEPS = 30
+    FIELDS = ('atoms', 'start', 'end', 'step')
 
-    for line in xyz_data[2:]:
-        line = line.strip()
-        # skips empty lines
-        if not line:
+    try:
+        with open(spec_path, 'r', newline='') as file:
+            if spec_path.lower().endswith('.json'):
+                entries = json.load(file)
+                if not isinstance(entries, dict):
+                    raise ValueError('it must map molecule names to scans')
+            else:
+                reader = csv.DictReader(file, skipinitialspace=True)
+                missing = [field for field in ('molecule',) + FIELDS if field not in (reader.fieldnames or [])]
+                if missing:
+                    raise ValueError(f'it is missing the columns {", ".join(missing)}')
+                entries = {row['molecule'].strip(): row for row in reader}
+    except (OSError, ValueError) as error:
+        print(f'Error! Could not read the scan spec {spec_path}: {error}')
+        sys.exit(1)
+
+    errors = []
+    warnings = []
+    specs = {}
+    used_entries = set()
+    for subjob in subjobs:
+        if subjob.name in entries:
+            key = subjob.name
+        else:
+            key = next((key for key in entries if fnmatch.fnmatchcase(subjob.name, key)), None)
+        if key is None:
+            errors.append(f'{subjob.name}: no scan matches this subjob')
+            continue
+        used_entries.add(key)
+
+        entry = entries[key]
+        if not isinstance(entry, dict) or any(entry.get(field) in (None, '') for field in FIELDS):
+            errors.append(f'{subjob.name}: the scan {key} needs {", ".join(FIELDS)}')
+            continue
+        try:
+            scan_start, scan_end, step_size = (float(entry[field]) for field in ('start', 'end', 'step'))
+        except (TypeError, ValueError):
+            errors.append(f'{subjob.name}: the start, end, and step of {key} must be numbers')
+            continue
+        if scan_start == scan_end or step_size == 0:
+            errors.append(f'{subjob.name}: the start and end of {key} must differ and its step cannot be 0')
             continue
 
-        atom, *_ = line.split()
-
-        # mind the off by one
-        if atom in atom_types['n1']:
-            n_atoms[0] += 1
-        elif atom in atom_types['n2']:
-            n_atoms[1] += 1
-        elif atom in atom_types['n3']:
-            n_atoms[2] += 1
-        elif atom in atom_types['n4']:
-            n_atoms[3] += 1
-        elif atom in atom_types['n5']:
-            n_atoms[4] += 1
+        # the atoms are indices if every part of them is an integer, otherwise a pattern
+        atoms = entry['atoms']
+        atom_parts = [str(atom) for atom in atoms] if isinstance(atoms, list) else str(atoms).split()
+        n_atoms = subjob.geometry.n_atoms
+        if all(re.fullmatch(r'-?\d+', part) for part in atom_parts):
+            atom_indices = [int(part) for part in atom_parts]
+            if not 2 <= len(atom_indices) <= 4:
+                errors.append(f'{subjob.name}: a scan needs 2 to 4 atoms, not {len(atom_indices)}')
+                continue
+            if not all(0 <= index < n_atoms for index in atom_indices):
+                errors.append(f'{subjob.name}: atom indices must be between 0 and {n_atoms - 1} (orca numbering)')
+                continue
         else:
-            n_atoms[5] += 1
+            try:
+                matches = match_atom_pattern(' '.join(atom_parts), subjob.geometry)
+            except ValueError as error:
+                errors.append(f'{subjob.name}: {error}')
+                continue
+            if len(matches) != 1:
+                examples = ', '.join(' '.join(map(str, match)) for match in matches[:3])
+                errors.append(f'{subjob.name}: {" ".join(atom_parts)} matches {len(matches)} sets of atoms, not 1'
+                              + (f' ({examples}{", ..." if len(matches) > 3 else ""})' if matches else ''))
+                continue
+            atom_indices = list(matches[0])
+
+        scan_end, n_steps = ScanData.count_steps(scan_start, scan_end, step_size)
+        if n_steps > MAX_STEPS:
+            warnings.append(f'{subjob.name}: {n_steps} steps is more than {MAX_STEPS}')
+        specs[subjob.name] = (atom_indices, scan_start, scan_end, n_steps)
+
+    # a scan that matches no subjob is most likely a typo
+    for key in entries:
+        if key not in used_entries:
+            errors.append(f'{key}: this scan matches no subjob')
+
+    for warning in warnings:
+        print(f'Warning: {warning}')
+    if errors:
+        print(f'Error! The scan spec {spec_path} is not valid for these subjobs:')
+        for error in errors:
+            print(f'    {error}')
+        sys.exit(1)
 
-    return n_atoms
+    return specs
+
+
+def basis_function_table(basis):
+    """returns the number of basis functions of each element for a basis set (e.g. def2-svp or ma-def2-tzvpp).
+    The numbers are approximate numbers of contracted spherical functions, given as shells for each block
+    of the periodic table. The minimally augmented ma- basis sets add one diffuse s and p shell to every
+    atom but H and He. Basis sets that are not in the table are treated as def2-SVP"""
+
+    BLOCKS = ('H He', 'Li Be', 'B C N O F Ne', 'Na Mg', 'Al Si P S Cl Ar', 'K Ca', 'Sc Ti V Cr Mn Fe Co Ni Cu Zn',
+              'Ga Ge As Se Br Kr', 'Rb Sr', 'Y Zr Nb Mo Tc Ru Rh Pd Ag Cd', 'In Sn Sb Te I Xe', 'Cs Ba',
+              'Hf Ta W Re Os Ir Pt Au Hg', 'Tl Pb Bi Po At Rn')
+    SHELLS = {
+        'def2-svp': ('2s1p', '3s2p', '3s2p1d', '4s3p1d', '4s3p1d', '5s3p1d', '5s3p2d1f',
+                     '5s4p2d', '4s3p1d', '5s3p2d', '5s4p1d', '5s4p1d', '5s3p2d1f', '5s4p2d'),
+        'def2-tzvp': ('3s1p', '5s3p1d', '5s3p2d1f', '5s4p2d1f', '5s5p2d1f', '6s4p3d1f', '6s4p4d1f',
+                      '6s5p3d1f', '6s4p3d1f', '6s4p3d1f', '6s5p3d1f', '6s4p3d1f', '6s4p3d1f', '6s5p3d1f'),
+        'def2-tzvpp': ('3s2p1d', '5s3p1d', '5s3p2d1f', '5s4p2d1f', '5s5p3d1f', '6s4p3d1f', '6s5p4d2f1g',
+                       '6s5p3d1f', '6s4p3d1f', '6s5p3d2f1g', '6s5p3d1f', '6s4p3d1f', '6s5p3d2f1g', '6s5p3d1f'),
+    }
+    FUNCTIONS_PER_SHELL = {'s': 1, 'p': 3, 'd': 5, 'f': 7, 'g': 9}
+    DIFFUSE = 4
+
+    basis = basis or ''
+    diffuse = basis.startswith('ma-')
+    shells = SHELLS.get(basis[3:] if diffuse else basis, SHELLS['def2-svp'])
+
+    table = {}
+    for block, block_shells in zip(BLOCKS, shells):
+        n_functions = sum(int(n) * FUNCTIONS_PER_SHELL[shell]
+                          for n, shell in re.findall(r'(\d+)([spdfg])', block_shells))
+        for element in block.split():
+            table[element] = n_functions + (DIFFUSE if diffuse and element not in ('H', 'He') else 0)
+
+    return table
+
+
+def count_functions(compositions, basis):
+    """takes a list of compositions (the number of atoms of each element) and returns the number of basis functions
+    of each as a numpy array. Every composition is counted at once as the product of a matrix of atom counts and a
+    vector of functions per element from basis_function_table().
+    Elements that are not in the table (e.g. lanthanides) are counted as the largest element in the table"""
+
+    table = basis_function_table(basis)
+    largest = max(table.values())
+
+    elements = sorted({element for composition in compositions for element in composition})
+    counts = np.array([[composition.get(element, 0) for element in elements] for composition in compositions],
+                      dtype=np.int64).reshape(len(compositions), len(elements))
+    functions = np.array([table.get(element.capitalize(), largest) for element in elements], dtype=np.int64)
+
+    return counts @ functions
+
+
+def count_aux_functions(n_functions, keywords):
+    """estimates the number of auxiliary functions from the number of basis functions and the keywords of the ! lines.
+    autoaux generates much larger auxiliary basis sets than def2/J, and jobs without RI have none"""
+
+    AUTOAUX_RATIO = 4
+    AUX_RATIO = 2.5
+    RI_KEYWORDS = ('ri', 'rij', 'rijk', 'rijcosx', 'rijdx', 'ri-mp2')
+
+    if 'autoaux' in keywords:
+        return n_functions * AUTOAUX_RATIO
+    elif any(keyword in RI_KEYWORDS or '/j' in keyword or '/c' in keyword for keyword in keywords):
+        return n_functions * AUX_RATIO
+    return n_functions * 0
 
 
 def read_settings(settings_lines):
@@ -504,31 +1032,133 @@ def read_settings(settings_lines):
     return n_cores, hess
 
 
-def estimate_memory(atom_count, hess):
-    """takes a 6 item list which indicates the atom count from an xyz file
-    then estimates the memory demands from this data in MB"""
+def estimate_memory(n_functions, n_aux, n_atoms, n_cores, hess):
+    """estimates the %maxcore of subjobs in MB from their numbers of basis functions, auxiliary functions, and atoms.
+    Takes numpy arrays, so every subjob is estimated at once.
+    Each core holds about SCF_MATRICES N_bf x N_bf matrices and the N_aux x N_aux metric of the auxiliary basis.
+    QM hessians also hold the 3 * n_atoms perturbed N_bf x N_bf densities and their fock matrices on every core,
+    since %maxcore is per core and each core works on its own perturbations. This term is the least certain, so it
+    carries a margin. orca solves the perturbations in batches that fit in %maxcore, so the model is capped at the most
+    memory per core that a job can request (MAX_ALLOWED_MEM).
+    Estimates are rounded up to 100 MB and are never below the few hundred MB orca needs to run at all"""
+
+    MB_PER_NUMBER = 8 / 1e6
+    SCF_MATRICES = 10
+    # the perturbed densities and their fock matrices
+    HESS_COPIES = 2
+    HESS_MARGIN = 1.5
+    MIN_MEMORY = 500
+
+    memory = (SCF_MATRICES * n_functions ** 2 + n_aux ** 2) * MB_PER_NUMBER
+    if hess:
+        memory = memory + HESS_MARGIN * HESS_COPIES * 3 * n_atoms * n_functions ** 2 * MB_PER_NUMBER
+        memory = np.minimum(memory, np.floor(MAX_ALLOWED_MEM * 1000 / n_cores / 100) * 100)
+
+    return np.maximum(np.ceil(memory / 100) * 100, MIN_MEMORY).astype(int)
 
-    def model_mem_hess(data_subset):
-        """model of the memory demand as a function of number of each atom type"""
-        n1, n2, n3, n4, n5, n6 = data_subset
-        return 0 * n1 + 100 * n2 + 100 * n3 + 100 * n4 + 100 * n5 + 100 * n6 + 100
 
-    def model_mem_no_hess(data_subset):
-        n1, n2, n3, n4, n5, n6 = data_subset
-        return 1000
+def describe_job(keywords, scan):
+    """takes the lowercase keywords of the ! lines of a job and returns its basis set and job type
+    (e.g. ('def2-svp', 'opt freq')), which are used to group similar jobs in the CostModel.
+    Auxiliary basis sets (e.g. def2/J) are skipped, even if they are listed before the orbital basis set"""
 
-    if hess:
-        memory_estimate = model_mem_hess(atom_count)
+    BASIS_TAGS = ('def2', 'svp', 'tzv', 'qzv', 'cc-p', '6-31', 'sto-')
+    AUX_SUFFIXES = ('/j', '/jk', '/c')
+
+    basis = next((keyword for keyword in keywords if any(tag in keyword for tag in BASIS_TAGS)
+                  and not keyword.endswith(AUX_SUFFIXES) and keyword != 'autoaux'), None)
+    if scan:
+        job_type = 'scan'
+    elif 'optts' in keywords:
+        job_type = 'optTS'
+    elif 'opt' in keywords:
+        job_type = 'opt'
     else:
-        memory_estimate = model_mem_no_hess(atom_count)
+        job_type = 'SP'
+    if 'freq' in keywords:
+        job_type += ' freq'
 
-    return memory_estimate
+    return basis, job_type
 
 
-def get_subjob_properties(filename):
+def load_cost_model():
+    """reads the samples recorded by process_orca_4 -calibrate from COST_MODEL_FILE and returns a CostModel,
+    or None if there are none"""
+
+    if not os.path.exists(COST_MODEL_FILE):
+        return None
+
+    try:
+        with open(COST_MODEL_FILE, 'r') as file:
+            model = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        print(f'Warning: {COST_MODEL_FILE} could not be read. Default memory and job time will be used.')
+        return None
+
+    if model.get('format') != COST_MODEL_FORMAT or not model.get('samples'):
+        return None
+    return CostModel(list(model['samples'].values()))
+
+
+def estimate_cost(n_functions, settings_lines, n_steps=1):
+    """estimates the cost of a subjob in cpu*hours from its number of basis functions.
+    This is a rough model: the cost scales with the cube of the number of basis functions,
+    and is scaled by job type"""
+
+    # cpu*hours of a single point with 500 basis functions
+    REFERENCE_COST = 0.5
+
+    cost = REFERENCE_COST * (n_functions / 500) ** 3
+
+    keywords = ' '.join(line.lower() for line in settings_lines if line.strip().startswith('!')).split()
+
+    # job type scaling, where an optimization is assumed to take about 10 single points
+    if 'optts' in keywords:
+        cost *= 15
+    elif 'opt' in keywords or n_steps > 1:
+        cost *= 10
+    if 'freq' in keywords:
+        cost *= 2
+
+    # each scan step is its own constrained optimization
+    return cost * n_steps
+
+
+def pack_subjobs(parent, subjobs):
+    """packs subjobs into as few SLURM jobs as possible whose predicted walltimes fit within the job time.
+    The largest subjobs are placed first, each into the first pack with room for it.
+    Subjobs that are predicted to exceed the job time on their own get their own pack, whose job time is raised to
+    its predicted walltime"""
+
+    max_walltime = parent.time_to_hours(parent.time)
+
+    packs = []
+    for subjob in sorted(subjobs, key=lambda subjob: subjob.walltime, reverse=True):
+        for pack in packs:
+            if pack.walltime + subjob.walltime <= max_walltime:
+                pack.add(subjob)
+                break
+        else:
+            pack = Pack(f'{parent.name}_pack{len(packs) + 1}', parent.time)
+            pack.add(subjob)
+            packs.append(pack)
+
+    for pack in packs:
+        if pack.walltime > max_walltime:
+            pack.time = format_hours(pack.walltime)
+
+    return packs
+
+
+def format_hours(hours):
+    """formats a number of hours as a SLURM time string (hh:mm:ss), rounded up to the minute"""
+    minutes = int(np.ceil(hours * 60))
+    return f'{minutes // 60}:{minutes % 60:02d}:00'
+
+
+def parse_subjob_name(filename):
     """Extracts subjob name, charge, and spin from the filename.
-       Returns None if file is formatted improperly
-       I chose not to make this a method of the subjob class so that subjobs could be validated before construction"""
+       Raises ValueError if file is formatted improperly"""
 
     subjob_name = filename.rstrip('_in')
 
@@ -547,6 +1177,18 @@ def get_subjob_properties(filename):
         return subjob_name, charge, spin
 
     except(IndexError, ValueError):
+        raise ValueError('the name is not formatted as {molecule_name}_{charge}_{spin}.xyz')
+
+
+def get_subjob_properties(filename):
+    """Extracts subjob name, charge, and spin from the filename.
+       Returns None if file is formatted improperly
+       I chose not to make this a method of the subjob class so that subjobs could be validated before construction"""
+
+    try:
+        return parse_subjob_name(filename)
+
+    except ValueError:
         print(f'Error: {filename} is not formatted correctly')
         print('Enter "1" to skip file. Enter "0" to terminate launch_orca_4')
 
@@ -560,37 +1202,234 @@ def get_subjob_properties(filename):
             return None
 
 
-def generate_orca_input(parent, subjob):
+def read_subjobs_in_bulk(file_names, keep_duplicates=False):
+    """Reads the names and geometries of many .xyz files at once in a thread pool, without prompting.
+    Files are read in sorted order, and a file with the same subjob name as an earlier one is skipped,
+    unless keep_duplicates is set (resume_subjobs expects both {name}.xyz and {name}_in.xyz).
+    Returns the subjobs and a list of [file name, problem] for every file that was skipped"""
+    MAX_WORKERS = 16
+
+    def read_subjob(file_name):
+        try:
+            subjob_name, subjob_charge, subjob_spin = parse_subjob_name(file_name[:-4])
+            return Subjob(file_name, subjob_name, subjob_charge, subjob_spin), None
+        except (OSError, ValueError) as error:
+            return None, [file_name, str(error)]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        results = list(pool.map(read_subjob, sorted(file_names)))
+
+    subjobs = []
+    skipped = []
+    names = set()
+    for (subjob, problem), file_name in zip(results, sorted(file_names)):
+        if problem is not None:
+            skipped.append(problem)
+        elif subjob.name in names and not keep_duplicates:
+            skipped.append([file_name, f'another file is also subjob {subjob.name}'])
+        else:
+            names.add(subjob.name)
+            subjobs.append(subjob)
+
+    return subjobs, skipped
+
+
+def is_finished(out_file):
+    """checks the last few lines of an orca .out file for normal termination.
+    Only the end of the file is read, so this is fast even for very large .out files"""
+    TAIL_BYTES = 4096
+
+    if not os.path.exists(out_file):
+        return False
+    with open(out_file, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - TAIL_BYTES))
+        tail = file.read().decode(errors='replace').split('\n')
+    return any(line.strip() == '****ORCA TERMINATED NORMALLY****' for line in tail[-5:])
+
+
+def read_last_frame(trj_file):
+    """returns the lines of the last complete frame of a multi-frame .xyz file (e.g. {name}_trj.xyz)"""
+    with open(trj_file, 'r') as file:
+        lines = file.readlines()
+
+    last_frame = None
+    i = 0
+    while i < len(lines) and lines[i].strip().isdigit():
+        frame_length = int(lines[i]) + 2
+        if i + frame_length > len(lines):
+            # the frame being written when the job was killed
+            break
+        last_frame = lines[i:i + frame_length]
+        i += frame_length
+    return last_frame
+
+
+def resume_subjobs(subjobs, use_guess=True):
+    """Leaves out the subjobs whose .out file terminated normally and sets up the others to restart.
+    Unfinished subjobs restart from the geometry orca wrote last, which is {name}.xyz if it exists,
+    otherwise the last frame of {name}_trj.xyz, otherwise the input geometry.
+    If the subjob left a .gbw file, it is copied to {name}_guess.gbw (orca cannot read the orbitals of the
+    .gbw file it is writing) and becomes the MORead guess of the subjob.
+    Returns the subjobs to run and a table describing every subjob"""
+
+    # a subjob may have both its input geometry ({name}_in.xyz) and the geometry orca wrote ({name}.xyz)
+    candidates = {}
+    for subjob in subjobs:
+        candidates.setdefault(subjob.name, []).append(subjob)
+
+    resumed = []
+    resume_table = []
+    for name, name_subjobs in sorted(candidates.items()):
+        if is_finished(f'{name}.out'):
+            resume_table.append([name, 'finished, left out'])
+            continue
+
+        # process_orca_4 moves the _trj.xyz and .gbw files to job_files/
+        trj_files = [path for path in (f'{name}_trj.xyz', f'job_files/{name}_trj.xyz') if os.path.exists(path)]
+        gbw_files = [path for path in (f'{name}.gbw', f'job_files/{name}.gbw') if os.path.exists(path)]
+
+        written = [subjob for subjob in name_subjobs if not os.path.basename(subjob.file).endswith('_in.xyz')]
+        if written:
+            subjob = written[0]
+            status = f'restarting from {os.path.basename(subjob.file)}'
+        elif trj_files and read_last_frame(trj_files[0]) is not None:
+            with open(f'{name}_in.xyz', 'w') as file:
+                file.writelines(read_last_frame(trj_files[0]))
+            subjob = Subjob(f'{name}_in.xyz', name, name_subjobs[0].charge, name_subjobs[0].spin)
+            status = f'restarting from the last frame of {trj_files[0]}'
+        else:
+            subjob = name_subjobs[0]
+            status = 'starting from the input geometry'
+
+        if gbw_files and use_guess:
+            subjob.guess = f'{name}_guess.gbw'
+            shutil.copyfile(gbw_files[0], subjob.guess)
+            status += f' with the orbitals of {gbw_files[0]}'
+
+        resumed.append(subjob)
+        resume_table.append([name, status])
+
+    return resumed, resume_table
+
+
+def generate_orca_input(parent, subjob, rename=True):
     """Generates Orca input files and renames xyz files.
-    input_name is added as a property to the subjob object"""
+    The later stages of a workflow do not rename, since their geometry is only copied in once the previous stage ends.
+    input_name and references (the files the input reads) are added as properties to the subjob object"""
 
     subjob.input_name = subjob.name + '.inp'
+    input_lines = []
+    if parent.scan:
+        input_lines.append('#' + subjob.scan_data.scan_desc + '\n')
+    input_lines += parent.settings
+    input_lines.append(f'%maxcore {parent.memory_per_core}\n')
+    if subjob.guess is not None:
+        input_lines.append(f'! MORead\n%moinp "{subjob.guess}"\n')
+    if parent.scan:
+        input_lines.append(subjob.scan_data.scan_codeblock)
+    input_lines.append(f'* xyzfile {subjob.charge} {subjob.spin} {subjob.name}_in.xyz\n\n')
+    input_lines.append(f'# This input file was created with {os.path.basename(__file__)}\n')
+
     with open(subjob.input_name, 'w') as inp_file:
-        if parent.scan:
-            inp_file.write('#' + subjob.scan_data.scan_desc + '\n')
-        inp_file.writelines(parent.settings)
-        inp_file.write(f'%maxcore {parent.memory_per_core}\n')
-        if parent.scan:
-            inp_file.write(subjob.scan_data.scan_codeblock)
-        inp_file.write(f'* xyzfile {subjob.charge} {subjob.spin} {subjob.name}_in.xyz\n\n')
-        inp_file.write(f'# This input file was created with {os.path.basename(__file__)}\n')
+        inp_file.writelines(input_lines)
+    subjob.references = read_references(subjob.input_name, ''.join(input_lines).splitlines())
+
+    # subjob.file is a path instead of a DirEntry when resume_subjobs wrote the geometry
+    file_name = os.path.basename(subjob.file)
+    if rename and not file_name.endswith('_in.xyz'):
+        os.rename(file_name, f'{subjob.name}_in.xyz')
+
+
+def generate_orca_inputs(parent, subjobs, rename=True):
+    """Generates the Orca input files of every subjob and renames their xyz files in one batched pass.
+    The files are written in a thread pool, since the time is spent waiting on the file system"""
+    MAX_WORKERS = 16
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        # list() waits for every input and raises the first error, if any
+        list(pool.map(lambda subjob: generate_orca_input(parent, subjob, rename), subjobs))
+
+
+def read_references(input_name, input_lines):
+    """returns the files that an orca .inp file reads from its lines, which are the .inp file itself,
+    its xyzfile (e.g. * xyzfile 0 1 name_in.xyz), and any guess orbitals (e.g. %moinp "name.gbw")"""
+
+    references = [input_name]
+    for line in input_lines:
+        parts = line.split()
+        if len(parts) > 4 and parts[0] == '*' and parts[1].lower() == 'xyzfile':
+            references.append(parts[4])
+        elif len(parts) > 1 and parts[0].lower() == '%moinp':
+            references.append(parts[1].strip('"'))
+
+    return references
+
+
+def format_subjob_block(name, references):
+    """formats the commands that run a single subjob in its own scratch directory.
+    The files the subjob reads (references, separated by spaces) are copied to the scratch directory just before
+    the subjob runs, and the results are copied back just after. The scratch directory is only removed if every
+    result was copied back, and is otherwise left in place with a message in the SLURM output.
+    $scratch is set for the final sync (see format_final_sync()).
+    name and references may also be shell variables (e.g. $name) for job arrays"""
+
+    subjob_block = f'scratch=$TMPDIR/{name}\n'
+    subjob_block += 'mkdir -p $scratch\n'
+    # the copies keep their modification times, so they are older than .last_sync and are not copied back
+    subjob_block += f'cp -p {references} $scratch/\n'
+    subjob_block += 'cd $scratch\n'
+    # dated a second back, so files written within the same second as the stamp still count as newer
+    subjob_block += "touch -d '1 second ago' .last_sync\n"
+    subjob_block += f'$ORCA {name}.inp >> $SLURM_SUBMIT_DIR/{name}.out\n'
+    # copies every file that is not a .tmp file and is new or changed since the subjob started, which also
+    # keeps the results of subjobs that stopped partway through
+    subjob_block += f'if find . -type f ! -iname "*.tmp*" ! -name .last_sync -newer .last_sync {COPY_BACK}; then\n'
+    subjob_block += '    cd $SLURM_SUBMIT_DIR\n'
+    subjob_block += '    rm -rf $scratch\n'
+    subjob_block += 'else\n'
+    subjob_block += '    cd $SLURM_SUBMIT_DIR\n'
+    subjob_block += f'    echo "Results of {name} could not all be copied back, so they were left in $scratch"\n'
+    subjob_block += 'fi\n'
+
+    return subjob_block
+
+
+def format_final_sync():
+    """formats the trap that copies back whatever the subjob running when the script exits has not copied back,
+    so results are kept even if the job is killed at its job time or a copy-back failed.
+    Scratch directories of subjobs that were copied back are already removed, so only the current one is synced"""
+
+    return f"""# Copies back anything the current subjob has not copied back when the script exits,
+# including when SLURM ends the job (TERM). cp -u skips files whose copies are up to date
+final_sync() {{
+    if [ -n "$scratch" ] && [ -d "$scratch" ]; then
+        cd $scratch && find . -type f ! -iname "*.tmp*" ! -name .last_sync {FINAL_SYNC}
+    fi
+}}
+trap final_sync EXIT
+trap 'exit 143' TERM
+"""
 
-    if not subjob.file.name.endswith('_in.xyz'):
-        os.rename(subjob.file.name, f'{subjob.name}_in.xyz')
 
+def generate_slurm_script(parent, subjobs, name=None, time=None):
+    """Generates the SLURM .sh script.
+    name is the name of the SLURM job and .sh file, and defaults to the name of the parent job.
+    time is the job time of the SLURM job, and defaults to the job time of the parent job"""
 
-def generate_slurm_script(parent, subjobs):
-    """Generates the SLURM .sh script."""
+    if parent.array:
+        generate_array_script(parent, subjobs)
+        return
+    if name is None:
+        name = parent.name
+    if time is None:
+        time = parent.time
 
-    subjob_string = ''
-    for subjob in subjobs:
-        subjob_string += f'$ORCA {subjob.input_name} >> $SLURM_SUBMIT_DIR/{subjob.name}.out\n'
-        # copies every file that is not a .tmp file after each subjob finishes to allow for partial completion
-        subjob_string += 'find "." -type f ! -iname "*.tmp*" -exec cp -t $SLURM_SUBMIT_DIR/ {} \;\n'
+    subjob_string = ''.join(format_subjob_block(subjob.name, ' '.join(subjob.references)) + '\n' for subjob in subjobs)
 
     slurm = f"""#!/bin/bash
-#SBATCH -J {parent.name}
-#SBATCH -t {parent.time}
+#SBATCH -J {name}
+#SBATCH -t {time}
 #SBATCH -N 1
 #SBATCH --ntasks-per-node={parent.n_cores}
 #SBATCH --mem {parent.total_memory}G
@@ -605,24 +1444,108 @@ module purge
 module use /project/carrow/downloads/apps/modules
 module add orca
 
-# Copy contents of the working directory to a temporary directory,
-# launch the job, and copy results back to the working directory
-cp * $TMPDIR/
-cd $TMPDIR
 ORCA=`which orca`
 echo $ORCA
 
+{format_final_sync()}
+# Each subjob copies the files it reads to its own temporary directory,
+# launches, copies results back to the working directory, and removes its temporary directory if that succeeded
 # Subjobs
-{subjob_string}
+{subjob_string}"""
+
+    with open(f'{name}.sh', 'w') as slurm_file:
+        slurm_file.write(slurm)
+
 
-cd $SLURM_SUBMIT_DIR
+def generate_array_script(parent, subjobs):
+    """Generates the SLURM .sh script for a job array, where each subjob is its own array task.
+    Each task only stages the files of its own subjob, so the job time is the time of a single subjob.
+    In the later stages of a workflow, each task first copies in the results of its subjob from the previous stage,
+    and in every stage of a workflow, a task only succeeds if its subjob terminated normally"""
+
+    array_range = f'0-{len(subjobs) - 1}'
+    if parent.array_cap is not None:
+        array_range += f'%{parent.array_cap}'
+    subjob_names = '\n'.join(subjob.name for subjob in subjobs)
+    subjob_references = '\n'.join(f'"{" ".join(subjob.references)}"' for subjob in subjobs)
+
+    previous_results = ''
+    if parent.previous_stage is not None:
+        previous = parent.previous_stage
+        previous_results = f"""
+# Take the final geometry and orbitals of this subjob from the previous stage
+# (its input geometry if the previous stage did not move the atoms), which process_orca may have moved
+cp -p {previous}/$name.xyz ${{name}}_in.xyz 2>/dev/null \\
+    || cp -p {previous}/${{name}}_in.xyz ${{name}}_in.xyz 2>/dev/null \\
+    || cp -p {previous}/inputs/${{name}}_in.xyz ${{name}}_in.xyz
+cp -p {previous}/$name.gbw ${{name}}_guess.gbw 2>/dev/null || cp -p {previous}/job_files/$name.gbw ${{name}}_guess.gbw
+"""
+    termination_check = ''
+    if parent.workflow:
+        termination_check = """
+# The task only succeeds if orca terminated normally, so the next stage only runs the subjobs that finished
+tail -n 5 $name.out | grep -qF '****ORCA TERMINATED NORMALLY****'
 """
 
+    slurm = f"""#!/bin/bash
+#SBATCH -J {parent.name}
+#SBATCH -t {parent.time}
+#SBATCH -N 1
+#SBATCH --ntasks-per-node={parent.n_cores}
+#SBATCH --mem {parent.total_memory}G
+#SBATCH --array={array_range}
+#SBATCH --mail-user={email}
+#SBATCH --mail-type=all
+
+# This shell file was created with {os.path.basename(__file__)}
+
+# Unload all loaded modules and reset everything to the original state;
+# then load ORCA binaries and set communication protocol
+module purge
+module use /project/carrow/downloads/apps/modules
+module add orca
+
+# Each array task runs the subjob at its index, which reads the files at the same index
+subjobs=(
+{subjob_names}
+)
+references=(
+{subjob_references}
+)
+name=${{subjobs[$SLURM_ARRAY_TASK_ID]}}
+staged=${{references[$SLURM_ARRAY_TASK_ID]}}
+{previous_results}
+ORCA=`which orca`
+echo $ORCA
+
+{format_final_sync()}
+# Copy the files this subjob reads to a temporary directory,
+# launch the job, copy results back to the working directory, and remove the temporary directory if that succeeded
+# Subjob
+{format_subjob_block('$name', '$staged')}{termination_check}"""
+
     with open(f'{parent.name}.sh', 'w') as slurm_file:
         slurm_file.write(slurm)
 
 
-def summarize(parent, subjobs):
+def measure_scans(subjobs):
+    """returns the current value of the scanned coordinate of every subjob.
+    The subjobs are grouped by the number of atoms in their scans, and each group is measured at once"""
+
+    values = np.zeros(len(subjobs))
+    groups = {}
+    for position, subjob in enumerate(subjobs):
+        groups.setdefault(len(subjob.scan_data.atom_indices), []).append(position)
+
+    for positions in groups.values():
+        points = np.stack([subjobs[position].geometry.points([subjobs[position].scan_data.atom_indices])[0]
+                           for position in positions])
+        values[positions] = Geometry.measure(points)
+
+    return values
+
+
+def summarize(parent, subjobs, packs=None):
     """summarizes the job parameters for the user"""
 
     # General job parameters
@@ -631,6 +1554,8 @@ def summarize(parent, subjobs):
     memory_string = f'{parent.memory_per_core}MB'
     if parent.custom_memory:
         memory_string += ' based on user input'
+    elif parent.reused_memory:
+        memory_string += ' reused from earlier %maxcore requests'
     else:
         if parent.hess:
             memory_string += ' based on QM hessian'
@@ -638,37 +1563,66 @@ def summarize(parent, subjobs):
             memory_string += ' based on no QM hessian'
     summary_table = [
         ['job name', parent.name],
-        ['job time', parent.time],
+        ['job time', parent.time + (' predicted from past jobs' if parent.predicted_time else '')],
         ['number of cores', parent.n_cores],
         ['memory per core', memory_string],
         ['total memory', f'{parent.total_memory}GB'],
+        ['basis functions', f'{parent.n_functions[0]} to {parent.n_functions[1]} per subjob ({parent.basis})'],
         ['settings', parent.settings_path]
     ]
+    if parent.array:
+        if parent.array_cap is None:
+            summary_table.insert(2, ['job array', f'{len(subjobs)} tasks'])
+        else:
+            summary_table.insert(2, ['job array', f'{len(subjobs)} tasks, {parent.array_cap} at a time'])
+    if parent.bulk and parent.skipped:
+        summary_table.insert(1, ['skipped files', f'{len(parent.skipped)} listed in {parent.name}_skipped.txt'])
+    if parent.workflow:
+        stage_string = f'{parent.stage} of {len(parent.settings_paths)}'
+        if parent.stage == 1:
+            stage_string += f', submit all stages with {parent.name}_workflow.sh'
+        else:
+            stage_string += f' in {parent.directory}/'
+        summary_table.insert(1, ['workflow stage', stage_string])
     print_table(summary_table)
     print(parent.settings[0][:-1])
     print(PAGE_BREAK)
 
     # Scan job summary
     if parent.scan:
+        current_values = measure_scans(subjobs)
         scan_summary_table = []
-        for subjob in subjobs:
-            scan_summary_table.append([subjob.name, subjob.scan_data.scan_desc])
+        for subjob, value in zip(subjobs, current_values):
+            n_atoms = len(subjob.scan_data.atom_indices)
+            scan_summary_table.append([subjob.name, subjob.scan_data.scan_desc,
+                                       f'currently {Geometry.format_measurement(value, n_atoms)}'])
         print('SCAN SUMMARY')
         print_table(scan_summary_table)
         print(PAGE_BREAK)
 
+    # Resume summary
+    if parent.resume:
+        print('RESUME SUMMARY')
+        print_table(parent.resume_table)
+        print(PAGE_BREAK)
 
-def main():
-    parent = Parent()
+    # Pack summary
+    if packs:
+        max_walltime = parent.time_to_hours(parent.time)
+        pack_summary_table = [['pack', 'subjobs', 'predicted walltime']]
+        for pack in packs:
+            walltime_string = format_hours(pack.walltime)
+            if pack.walltime > max_walltime:
+                walltime_string += f' exceeds job time of {parent.time}, submitted with {pack.time}!'
+            pack_summary_table.append([pack.name, len(pack.subjobs), walltime_string])
+        print('PACK SUMMARY')
+        print_table(pack_summary_table)
+        print(PAGE_BREAK)
 
-    # default behavior for job time and settings path
-    if parent.time is None:
-        parent.time = DEFAULT_TIME
-    if parent.settings_path is None:
-        # selection menu of default orca settings
-        parent.settings_path = launch_settings_menu()
 
-    # loads settings and cleanly formats them
+def load_settings(parent):
+    """loads the settings file of the parent, cleanly formats it, and reads the number of cores and hessian from it"""
+
     with open(parent.settings_path, 'r') as file:
         parent.settings = file.readlines()
     if parent.settings[-1][-1] != '\n':
@@ -686,38 +1640,194 @@ def main():
         print('Error! Settings file must contain %pal NPROCS')
         exit(1)
 
+
+def set_memory(parent, subjobs, cost_model):
+    """counts the basis functions of the subjobs and sets the memory per core and total memory of the parent.
+    The job type and basis set (parent.job_key) are also set for predictions from past jobs"""
+
+    keywords = ' '.join(line.lower() for line in parent.settings if line.strip().startswith('!')).split()
+    parent.job_key = describe_job(keywords, parent.scan)
+
+    # counts the basis functions, auxiliary functions, and atoms of every subjob at once
+    n_functions = count_functions([subjob.composition for subjob in subjobs], parent.job_key[0])
+    n_aux = count_aux_functions(n_functions, keywords)
+    n_atoms = np.array([sum(subjob.composition.values()) for subjob in subjobs])
+    for subjob, subjob_functions in zip(subjobs, n_functions):
+        subjob.n_functions = int(subjob_functions)
+    parent.basis = parent.job_key[0]
+    parent.n_functions = (int(n_functions.min()), int(n_functions.max()))
+
+    # default memory behavior, which reuses the %maxcore of earlier jobs if there are enough for every subjob
+    if parent.memory_per_core is None:
+        reused_memory = []
+        if cost_model is not None:
+            reused_memory = [cost_model.reuse_maxcore(parent.job_key, subjob.n_functions) for subjob in subjobs]
+        if reused_memory and None not in reused_memory:
+            parent.memory_per_core = max(reused_memory)
+            parent.reused_memory = True
+        else:
+            memory_estimates = estimate_memory(n_functions, n_aux, n_atoms, parent.n_cores, parent.hess)
+            parent.memory_per_core = int(memory_estimates.max())
+    # Ensures SLURM total memory is the lowest integer number of GB that satisfy the memory needs
+    parent.total_memory = int(np.ceil(parent.memory_per_core * parent.n_cores / 1000))
+    if parent.total_memory > MAX_ALLOWED_MEM:
+        print(f"""Error! excessive memory ({parent.total_memory}G) requested!
+Lower memory below {MAX_ALLOWED_MEM}G by lowering %pal nprocs or
+specifying a lower memory_per_core on as an argument (e.g. launch_orca_4 2000M)""")
+        exit(1)
+
+
+def set_time(parent, subjobs, cost_model):
+    """predicts the walltime of each subjob from past jobs if possible and sets the default job time of the parent.
+    The cost in cpu*hours is assumed to be independent of the number of cores"""
+
+    for subjob in subjobs:
+        subjob.n_steps = subjob.scan_data.n_steps if parent.scan else 1
+        subjob.predicted_walltime = None
+        if cost_model is not None:
+            cost = cost_model.predict_cost(parent.job_key, subjob.n_functions)
+            if cost is not None:
+                subjob.predicted_walltime = cost * subjob.n_steps / parent.n_cores
+
+    # default job time, which is predicted if every subjob was predicted
+    # each pack fits the default job time instead, and each array task only runs one subjob
+    if parent.time is None:
+        walltimes = [subjob.predicted_walltime for subjob in subjobs]
+        if None not in walltimes and not parent.pack:
+            parent.time = format_hours(max(walltimes) if parent.array else sum(walltimes))
+            parent.predicted_time = True
+        else:
+            parent.time = DEFAULT_TIME
+
+
+def generate_workflow(parent, subjobs, cost_model):
+    """Configures and writes every stage of a workflow after the first, each in its own directory named after its
+    settings file, and writes {job}_workflow.sh, which submits the stages.
+    Each stage is a copy of the parent with its own settings, memory, and job time.
+    Its subjobs read the final geometry and orbitals of the same subjob in the previous stage.
+    Returns the stages, starting with the parent"""
+
+    stages = [parent]
+    for stage_number, settings_path in enumerate(parent.settings_paths[1:], start=2):
+        stage = copy.copy(parent)
+        stage.name = os.path.basename(settings_path)
+        stage.settings_path = settings_path
+        stage.stage = stage_number
+        stage.directory = stage.name
+        stage.previous_stage = os.path.relpath(stages[-1].directory, stage.directory)
+        if not parent.custom_memory:
+            stage.memory_per_core = None
+            stage.reused_memory = False
+        if not parent.custom_time:
+            stage.time = None
+            stage.predicted_time = False
+
+        load_settings(stage)
+        set_memory(stage, subjobs, cost_model)
+        set_time(stage, subjobs, cost_model)
+
+        # the geometry and orbitals are copied in by the SLURM script once the previous stage has made them
+        reads_guess = any('%moinp' in line.lower() for line in stage.settings)
+        os.makedirs(stage.directory, exist_ok=True)
+        os.chdir(stage.directory)
+        for subjob in subjobs:
+            subjob.guess = None if reads_guess else f'{subjob.name}_guess.gbw'
+        generate_orca_inputs(stage, subjobs, rename=False)
+        generate_slurm_script(stage, subjobs)
+        os.chdir('..')
+
+        stages.append(stage)
+
+    # each array task waits for the task of the same subjob in the previous stage (aftercorr),
+    # and is cancelled if that task failed. sbatch --parsable may append ';cluster' to the job id
+    submissions = f'stage_1=$(sbatch --parsable {parent.name}.sh)\n'
+    for stage in stages[1:]:
+        submissions += (f'stage_{stage.stage}=$(cd {stage.directory} && sbatch --parsable '
+                        f'--dependency=aftercorr:${{stage_{stage.stage - 1}%%;*}} --kill-on-invalid-dep=yes '
+                        f'{stage.name}.sh)\n')
+    submissions += 'echo "Submitted ' + ' '.join(f'{stage.name}: $stage_{stage.stage}' for stage in stages) + '"\n'
+
+    workflow = f"""#!/bin/bash
+
+# This shell file was created with {os.path.basename(__file__)}
+
+# Submits every stage of the workflow as a job array. Each subjob moves to the next stage
+# as soon as it terminates normally, without waiting for the rest of its stage
+cd "$(dirname "$0")"
+{submissions}"""
+
+    with open(f'{parent.name}_workflow.sh', 'w') as workflow_file:
+        workflow_file.write(workflow)
+
+    return stages
+
+
+def main():
+    parent = Parent()
+
+    # default behavior for settings path. The default job time is set once the subjobs are known
+    if parent.settings_path is None:
+        # selection menu of default orca settings
+        parent.settings_path = launch_settings_menu()
+
+    # loads settings and cleanly formats them
+    load_settings(parent)
+
     # initiates subjob objects for every valid .xyz file and exits if there are none
+    # the trajectories orca writes during optimizations are not subjobs
+    xyz_files = [file for file in os.scandir('.')
+                 if file.name.endswith('.xyz') and not (parent.resume and file.name.endswith('_trj.xyz'))]
     subjobs = []
-    for file in os.scandir('.'):
-        if file.name.endswith('.xyz'):
+    if parent.bulk:
+        # every malformed file is reported at once instead of prompting for each
+        subjobs, parent.skipped = read_subjobs_in_bulk([file.name for file in xyz_files], keep_duplicates=parent.resume)
+        if parent.skipped:
+            with open(f'{parent.name}_skipped.txt', 'w') as report_file:
+                report_file.writelines(f'{file_name}: {problem}\n' for file_name, problem in parent.skipped)
+            print(f'Skipping {len(parent.skipped)} malformed .xyz files (listed in {parent.name}_skipped.txt):')
+            print_table(parent.skipped[:10])
+            if len(parent.skipped) > 10:
+                print(f'... and {len(parent.skipped) - 10} more')
+        elif os.path.exists(f'{parent.name}_skipped.txt'):
+            os.remove(f'{parent.name}_skipped.txt')
+    else:
+        for file in xyz_files:
             subjob_properties = get_subjob_properties(file.name[:-4])
             # get_subjob_properties returns None when formatted incorrectly and skipped by user
             if subjob_properties is None:
                 continue
             else:
                 subjob_name, subjob_charge, subjob_spin = subjob_properties
-                subjobs.append(Subjob(file, subjob_name, subjob_charge, subjob_spin))
+                try:
+                    subjobs.append(Subjob(file, subjob_name, subjob_charge, subjob_spin))
+                except ValueError as error:
+                    print(f'Error: {file.name} is not a valid xyz file: {error}')
+                    sys.exit(1)
     if len(subjobs) == 0:
         print('There are no valid xyz files! Terminating the script.')
         sys.exit(1)
 
-    # default memory behavior
-    if parent.memory_per_core is None:
-        parent.memory_per_core = 0
+    # leaves out finished subjobs and restarts the others. Settings that already read a guess keep it
+    if parent.resume:
+        reads_guess = any('%moinp' in line.lower() for line in parent.settings)
+        subjobs, parent.resume_table = resume_subjobs(subjobs, use_guess=not reads_guess)
+        if len(subjobs) == 0:
+            print_table(parent.resume_table)
+            print('Every subjob has finished! There is nothing to resume.')
+            sys.exit(1)
+
+    # loads the past jobs recorded by process_orca_4 -calibrate, if there are any
+    cost_model = load_cost_model()
+    set_memory(parent, subjobs, cost_model)
+
+    # Scans read from a scan spec, which are validated for every subjob at once
+    if parent.scan_spec is not None:
+        scan_specs = read_scan_spec(parent.scan_spec, subjobs)
         for subjob in subjobs:
-            memory_estimate = estimate_memory(count_atoms(subjob.lines), parent.hess)
-            if memory_estimate > parent.memory_per_core:
-                parent.memory_per_core = memory_estimate
-    # Ensures SLURM total memory is the lowest integer number of GB that satisfy the memory needs
-    parent.total_memory = int(np.ceil(parent.memory_per_core * parent.n_cores / 1000))
-    if parent.total_memory > MAX_ALLOWED_MEM:
-        print(f"""Error! excessive memory ({parent.total_memory}G) requested!
-Lower memory below {MAX_ALLOWED_MEM}G by lowering %pal nprocs or
-specifying a lower memory_per_core on as an argument (e.g. launch_orca_4 2000M)""")
-        exit(1)
+            subjob.scan_data = ScanData(subjob, spec=scan_specs[subjob.name])
 
     # Interactive scan session
-    if parent.scan:
+    elif parent.scan:
         print(PAGE_BREAK)
         print("""    Welcome to the interactive scan application!
     This application allows you to set up batch scan jobs
@@ -737,23 +1847,52 @@ specifying a lower memory_per_core on as an argument (e.g. launch_orca_4 2000M)"
 
         print(PAGE_BREAK)
 
+    # predicts the walltime of each subjob from past jobs if possible, then sets the default job time
+    set_time(parent, subjobs, cost_model)
+
     # Generate Orca input files and rename xyz files
-    for subjob in subjobs:
-        generate_orca_input(parent, subjob)
+    generate_orca_inputs(parent, subjobs)
+
+    # Generate the SLURM .sh script, or one for each pack of subjobs
+    packs = None
+    if parent.pack:
+        for subjob in subjobs:
+            subjob.walltime = subjob.predicted_walltime
+            if subjob.walltime is None:
+                cost = estimate_cost(subjob.n_functions, parent.settings, subjob.n_steps)
+                subjob.walltime = cost / parent.n_cores
+        packs = pack_subjobs(parent, subjobs)
+
+        # removes packs from previous launches so the shell file only submits these
+        for file in os.listdir('.'):
+            if re.fullmatch(rf'{re.escape(parent.name)}_pack\d+\.sh', file):
+                os.remove(file)
+        for pack in packs:
+            generate_slurm_script(parent, pack.subjobs, pack.name, pack.time)
+    else:
+        generate_slurm_script(parent, subjobs)
 
-    # Generate the SLURM .sh script
-    generate_slurm_script(parent, subjobs)
+    # Later stages of a workflow are written in their own directories
+    stages = [parent]
+    if parent.workflow:
+        stages = generate_workflow(parent, subjobs, cost_model)
 
     # Summarizes results
-    summarize(parent, subjobs)
+    for stage in stages:
+        summarize(stage, subjobs, packs)
 
 
 if __name__ == '__main__':
-    arg_list = sys.argv[3:7]
+    arg_list = sys.argv[3:]
     email = sys.argv[1]
     default_path = f'{sys.argv[2]}/python_scripts/orca_settings/'
     DEFAULT_TIME = '1:00:00'
+    COST_MODEL_FILE = os.environ.get('CARROW_COST_MODEL', os.path.expanduser('~/.carrow_cost_model.json'))
+    COST_MODEL_FORMAT = 1
     MAX_ALLOWED_MEM = 120
     PAGE_BREAK = '-' * 80
+    # copies the files found by find to the submit directory, the final sync only copies files newer than their copies
+    COPY_BACK = '-exec cp -t $SLURM_SUBMIT_DIR/ {} +'
+    FINAL_SYNC = '-exec cp -u -t $SLURM_SUBMIT_DIR/ {} +'
     job_name = os.path.basename(os.getcwd())
     main()
@@ -14,106 +14,374 @@ Version Initials    Date            Summary
 1.0     ARS         28-Jun-2023     initial draft
 2.0     ARS         29-Jun-2023     added documentation and handles jobs that crashed during SCF
 2.0                                 also reports last SCF
+2.1     ARS         16-Oct-2026     .out files are read once by the PostmortemParser state machine, which emits cycle, SCF,
+2.1                                 energy, convergence, and hessian events. Lines outside of these sections are skipped by
+2.1                                 searching the memory mapped file for markers and truncated files no longer raise errors.
+2.1                                 The .csv file is unchanged.
+2.2     ARS         16-Oct-2026     added -all flag, which finds the failed jobs of a directory from the end of their .out files,
+2.2                                 analyzes them in a process pool, and writes an overview .csv of every failed job
+2.3     ARS         16-Oct-2026     added -watch flag, which monitors running jobs by parsing only the bytes written since the
+2.3                                 last poll (checkpointed in .orca_watch.json) and flags jobs that look stuck. Added -once
+2.4     ARS         16-Oct-2026     -all finds unconverged optimizations anywhere in the .out file, not just near its end
+2.5     ARS         16-Oct-2026     -all searches backwards for the last optimization banner and stops at the first found,
+2.5                                 and skips jobs without an optimization
 """
 version = edit_history.strip().split('\n')[-1].split()[0]
 
 
+import os
 import csv
+import json
+import mmap
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 
-def write_convergence_csv(lines, name):
-    """writes a csv containing SCF and Geopt convergence data"""
+class Options(object):
+    """holds the command line options of orca_postmortem
+    arguments are contextually interpreted, so they may be passed in any order"""
+
+    def __init__(self, arg_list):
+        self.filename = None
+        self.batch = False
+        self.watch = False
+        self.once = False
+        self.n_workers = os.cpu_count() or 1
+        self.interval = 60
+
+        self.parse_args(arg_list)
+
+    @staticmethod
+    def generate_std_error(error_message=''):
+        """Standard error message and exit command"""
+        if error_message:
+            print(f'Error: {error_message}')
+        print('Usage: orca_postmortem outfile.out')
+        print('       orca_postmortem -all [n_workers]')
+        print('       orca_postmortem -watch [outfile.out] [interval] [-once]')
+        print('Use "orca_postmortem -help" for the manual')
+        sys.exit(1)
+
+    def parse_args(self, arg_list):
+        """parses command line arguments to determine the .out file and if every failed job is analyzed
+        or if running jobs are watched. A bare integer is the number of worker processes used by -all,
+        which otherwise uses every available core, or the seconds between polls of -watch"""
+
+        number = None
+        for arg in arg_list:
+            if arg.isdigit():
+                if number is None and int(arg) > 0:
+                    number = int(arg)
+                else:
+                    self.generate_std_error(f'{arg} is not a valid number')
+            elif arg.lower() in ('-a', '-all'):
+                self.batch = True
+            elif arg.lower() in ('-w', '-watch'):
+                self.watch = True
+            elif arg.lower() in ('-o', '-once'):
+                self.once = True
+            elif arg.lower() in ('-v', '-version'):
+                print(f'orca_postmortem version {version}')
+                sys.exit(0)
+            elif os.path.isfile(arg):
+                if self.filename is None:
+                    self.filename = arg
+                else:
+                    self.generate_std_error(f'Two .out files: {self.filename} and {arg}')
+            else:
+                self.generate_std_error(f'{arg} not recognized')
+
+        if self.batch and self.watch:
+            self.generate_std_error('-all and -watch cannot be used together')
+        if self.batch == (self.filename is not None) and not self.watch:
+            self.generate_std_error('either an .out file, -all, or -watch is required')
+        if self.once and not self.watch:
+            self.generate_std_error('-once is only used with -watch')
+        if number is not None:
+            if self.batch:
+                self.n_workers = number
+            elif self.watch:
+                self.interval = number
+            else:
+                self.generate_std_error(f'{number} is only used with -all or -watch')
+
+
+class PostmortemParser(object):
+    """State machine which reads an orca .out file once as a stream of lines and emits events.
+    feed() takes the next line and returns a list of events, and close() returns the events of any section
+    that was cut off by the end of the file. Events are tuples of the form
+    ('cycle', cycle number), ('scf', number of SCF iterations), ('scf_log', lines of the SCF section),
+    ('energy', final single point energy), ('convergence', split lines of the convergence table),
+    and ('hessian', list of negative frequencies).
+    Only the section currently being read is held in memory, so memory use does not grow with the size of the file.
+    Every attribute is a plain python type so that the state can be saved between reads of a growing file"""
+
+    CYCLE = 'GEOMETRY OPTIMIZATION CYCLE'
+    SCF = 'SCF ITERATIONS'
+    SCF_END = '*****************************************************'
+    ENERGY = 'FINAL SINGLE POINT ENERGY'
+    CONVERGENCE = '|Geometry convergence|'
+    HESSIAN = 'Writing the Hessian file to the disk'
+
+    # the SCF log runs from 2 lines after SCF to 3 lines after SCF_END, the convergence table runs from 3 to 7 lines
+    # after CONVERGENCE, and the frequency table starts 11 lines after HESSIAN
+    SCF_LOG_START = 2
+    SCF_LOG_END = 3
+    CONVERGENCE_START = 3
+    CONVERGENCE_END = 7
+    FREQ_START = 11
+
+    # every line that can start a section or emit an event contains one of these, so all other lines can be skipped
+    MARKERS = (b'GEOMETRY OPTIMIZATION CYCLE', b'SCF ITERATIONS', b'FINAL SINGLE POINT ENERGY',
+               b'|Geometry convergence|', b'Writing the Hessian file to the disk')
+
+    def __init__(self):
+        # the sections being read, which are None when not being read
+        self.scf = None
+        self.convergence = None
+        self.hessian = None
+
+    @property
+    def reading(self):
+        """True if a section is being read, in which case no line may be skipped"""
+        return self.scf is not None or self.convergence is not None or self.hessian is not None
+
+    def feed(self, line):
+        """reads the next line of the .out file and returns the resulting events"""
+
+        events = []
+        if self.scf is not None:
+            self.read_scf(line, events)
+        if self.convergence is not None:
+            self.read_convergence(line, events)
+        if self.hessian is not None:
+            self.read_hessian(line, events)
+
+        if self.CYCLE in line:
+            split_line = line.split()
+            events.append(('cycle', split_line[4] if len(split_line) > 4 else ''))
+        elif line.rstrip('\r\n') == self.SCF and line.endswith('\n'):
+            if self.scf is not None:
+                self.close_scf(events)
+            self.scf = {'offset': 0, 'iterations': None, 'end': None, 'lines': []}
+        elif self.ENERGY in line:
+            split_line = line.split()
+            events.append(('energy', split_line[4] if len(split_line) > 4 else ''))
+        elif self.CONVERGENCE in line:
+            self.convergence = {'offset': 0, 'items': []}
+        elif self.HESSIAN in line:
+            self.hessian = {'offset': 0, 'neg_freqs': []}
+
+        return events
+
+    def read_scf(self, line, events):
+        """counts the SCF iterations until SCF_END and then keeps the next few lines for the SCF log"""
+
+        scf = self.scf
+        scf['offset'] += 1
+        if scf['end'] is None:
+            if self.SCF_END in line:
+                scf['end'] = 0
+                events.append(('scf', scf['iterations']))
+            else:
+                # the iteration count is one more than the last line starting with a number
+                split_line = line.split()
+                if split_line and split_line[0].isdigit():
+                    scf['iterations'] = int(split_line[0]) + 1
+        else:
+            scf['end'] += 1
+
+        if scf['offset'] >= self.SCF_LOG_START:
+            scf['lines'].append(line)
+        if scf['end'] == self.SCF_LOG_END:
+            events.append(('scf_log', scf['lines']))
+            self.scf = None
+
+    def close_scf(self, events):
+        """emits the events of an SCF section that did not finish"""
+        if self.scf['end'] is None:
+            events.append(('scf', self.scf['iterations']))
+        events.append(('scf_log', self.scf['lines']))
+        self.scf = None
+
+    def read_convergence(self, line, events):
+        """collects the lines of the convergence table"""
+
+        convergence = self.convergence
+        convergence['offset'] += 1
+        if convergence['offset'] >= self.CONVERGENCE_START:
+            convergence['items'].append(line.split())
+        if convergence['offset'] == self.CONVERGENCE_END:
+            events.append(('convergence', convergence['items']))
+            self.convergence = None
+
+    def read_hessian(self, line, events):
+        """collects the negative frequencies of the frequency table, which ends at a blank line"""
+
+        hessian = self.hessian
+        hessian['offset'] += 1
+        if hessian['offset'] < self.FREQ_START:
+            return
+        if line.strip() == '':
+            events.append(('hessian', hessian['neg_freqs']))
+            self.hessian = None
+            return
 
-    def find_negative_frequencies(start, outlines):
-        """This helper function retrieves negative frequencies once a hessian is found"""
-        results = []
-        i = start + 11
-        while outlines[i].strip() != '':
-            frequency = float(outlines[i].split()[1])
-            if frequency < 0:
-                results.append(frequency)
-            i += 1
-        return results
-
-    def process_scf(lines, start):
-        """This helper function finds the number of iterations an SCF step has taken
-        by reading outlines starting from start.
-        It returns the number of iterations, start, and the end of the scf section"""
-
-        # finds the end of the SCF section. If the end string is not found, uses end of file
-        end = None
-        for i in range(start, len(lines)):
-            if '*****************************************************' in lines[i]:
-                end = i
+        try:
+            frequency = float(line.split()[1])
+        except (IndexError, ValueError):
+            return
+        if frequency < 0:
+            hessian['neg_freqs'].append(frequency)
+
+    def close(self):
+        """returns the events of the sections cut off by the end of the file"""
+
+        events = []
+        if self.scf is not None:
+            self.close_scf(events)
+        if self.convergence is not None:
+            events.append(('convergence', self.convergence['items']))
+            self.convergence = None
+        if self.hessian is not None:
+            events.append(('hessian', self.hessian['neg_freqs']))
+            self.hessian = None
+        return events
+
+
+def feed_bytes(parser, mapped, start, end):
+    """feeds the complete lines of mapped between start and end to parser, skipping every line that is outside
+    of a section and does not contain a marker. start must be the start of a line.
+    Markers are found with bytes.find, which is much faster than reading the skipped lines or a regex search.
+    Returns the events and the position after the last complete line"""
+
+    events = []
+    position = start
+
+    # the next position of each marker, which is only searched for again once it has been passed
+    next_markers = [-1] * len(parser.MARKERS)
+    while position < end:
+        if not parser.reading:
+            for i, marker in enumerate(parser.MARKERS):
+                if next_markers[i] < position:
+                    found = mapped.find(marker, position, end)
+                    next_markers[i] = found if found != -1 else end
+            next_marker = min(next_markers)
+            if next_marker >= end:
+                # skips to the end of the last complete line
+                position = mapped.rfind(b'\n', position, end) + 1 or position
                 break
-        if not end:
-            end = len(lines)
-
-        # scans from end to start of the SCF section looking for a line that starts with a digit
-        for i in reversed(range(start, end)):
-            splitline = lines[i].split()
-            if len(splitline) > 0:
-                iteration = splitline[0]
-                if iteration.isdigit():
-                    return int(iteration) + 1, start, end
-
-    # initialize tables with headers
-    # tolerance table skips rows to line up with convergence table
-    geopt_tolerance_table = [['', '', '', '', 'Tolerances'],
-                       ['', '', '', '', 'abs Energy Change', 'RMS Gradient', 'MAX Gradient', 'RMS Step', 'MAX Step']]
-    geopt_convergence_table = [['Convergence Data'],
-                         ['Iteration', 'SCF Steps', 'Energy', 'rel Energy Change',
-                          'abs Energy Change', 'RMS Gradient', 'MAX Gradient', 'RMS Step', 'MAX Step']]
-    neg_freq_table = [['Negative Frequencies'], ['Iteration', 'Negative Frequencies']]
-
-    # initialize the start and stop of the most recent SCF section
-    scf_start = None
-    scf_end = None
-
-    for i in range(0, len(lines)):
-        if 'GEOMETRY OPTIMIZATION CYCLE' in lines[i]:
-            geopt_convergence_table.append([lines[i].split()[4], '', '', '', '', '', ''])
-        elif lines[i] == 'SCF ITERATIONS\n':
-            geopt_convergence_table[-1][1], scf_start, scf_end = process_scf(lines, i)
-        elif 'FINAL SINGLE POINT ENERGY' in lines[i]:
-            geopt_convergence_table[-1][2] = lines[i].split()[4]
-        elif '|Geometry convergence|' in lines[i]:
-            if len(geopt_convergence_table) == 3:
-                # First iteration does not have a change in energy, so skip convergence_table[-1][2]
+            position = mapped.rfind(b'\n', position, next_marker) + 1 or position
+
+        line_end = mapped.find(b'\n', position, end)
+        if line_end == -1:
+            break
+        events.extend(parser.feed(mapped[position:line_end + 1].decode(errors='replace')))
+        position = line_end + 1
+
+    return events, position
+
+
+class ConvergenceTables(object):
+    """Builds the tables of the postmortem .csv file from the events of a PostmortemParser"""
+
+    def __init__(self):
+        # initialize tables with headers
+        # tolerance table skips rows to line up with convergence table
+        self.geopt_tolerance_table = [['', '', '', '', 'Tolerances'],
+                                      ['', '', '', '', 'abs Energy Change', 'RMS Gradient', 'MAX Gradient',
+                                       'RMS Step', 'MAX Step']]
+        self.geopt_convergence_table = [['Convergence Data'],
+                                        ['Iteration', 'SCF Steps', 'Energy', 'rel Energy Change',
+                                         'abs Energy Change', 'RMS Gradient', 'MAX Gradient', 'RMS Step', 'MAX Step']]
+        self.neg_freq_table = [['Negative Frequencies'], ['Iteration', 'Negative Frequencies']]
+        self.last_scf = []
+        self.last_scf_steps = ''
+
+    def add(self, event):
+        """updates the tables with a single event"""
+
+        kind, data = event
+        table = self.geopt_convergence_table
+        if kind == 'cycle':
+            table.append([data, '', '', '', '', '', ''])
+        elif kind == 'scf':
+            table[-1][1] = data if data is not None else ''
+            self.last_scf_steps = table[-1][1]
+        elif kind == 'energy':
+            table[-1][2] = data
+        elif kind == 'convergence':
+            values = [item[2] if len(item) > 2 else '' for item in data]
+            if len(table) == 3:
+                # First iteration does not have a change in energy
                 # appending 'RMS Gradient', 'MAX Gradient', 'RMS Step', 'MAX Step'
-                geopt_convergence_table[-1][5:9] = [line.split()[2] for line in lines[i + 3:i + 7]]
-            else:
+                table[-1][5:9] = values[:4]
+            elif values:
                 # appending 'abs Energy Change', 'RMS Gradient', 'MAX Gradient', 'RMS Step', 'MAX Step'
-                rel_en, rms_grad, max_grad, rms_step, max_step = [line.split()[2] for line in lines[i + 3:i + 8]]
-                geopt_convergence_table[-1][3] = rel_en
-                geopt_convergence_table[-1][4] = abs(float(rel_en))
-                geopt_convergence_table[-1][5:9] = rms_grad, max_grad, rms_step, max_step
+                table[-1][3] = values[0]
+                try:
+                    table[-1][4] = abs(float(values[0]))
+                except ValueError:
+                    table[-1][4] = ''
+                table[-1][5:9] = values[1:5]
 
             # populates tolerance_table with first iteration of |Geometry convergence| that is complete
-            if len(geopt_convergence_table) == 4:
-                geopt_tolerance_table.append(['', '', '', ''] + [line.split()[3] for line in lines[i + 3:i + 8]])
-        elif 'Writing the Hessian file to the disk' in lines[i]:
-            iteration = geopt_convergence_table[-1][0]
-            neg_freqs = find_negative_frequencies(i, lines)
-            neg_freq_table.append([iteration, neg_freqs])
+            if len(table) == 4:
+                self.geopt_tolerance_table.append(['', '', '', ''] + [item[3] if len(item) > 3 else ''
+                                                                      for item in data])
+        elif kind == 'hessian':
+            self.neg_freq_table.append([table[-1][0], data])
+        elif kind == 'scf_log':
+            self.last_scf = data
+
 
-    # extends scf section to include summary but avoids crashing if file ends during scf
-    if scf_end + 1 < len(lines):
-        scf_end += 1
+def analyze_out_file(filename):
+    """reads an orca .out file in a single pass and returns its ConvergenceTables"""
+
+    parser = PostmortemParser()
+    tables = ConvergenceTables()
+    with open(filename, 'rb') as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            mapped = None
+
+        # files that cannot be memory mapped (e.g. empty files) are read line by line
+        if mapped is None:
+            for line in file:
+                for event in parser.feed(line.decode(errors='replace')):
+                    tables.add(event)
+        else:
+            with mapped:
+                events, position = feed_bytes(parser, mapped, 0, len(mapped))
+
+                # the last line has no newline, so it is fed separately
+                if position < len(mapped):
+                    events.extend(parser.feed(mapped[position:].decode(errors='replace')))
+            for event in events:
+                tables.add(event)
+
+    for event in parser.close():
+        tables.add(event)
+    return tables
+
+
+def write_convergence_csv(tables, name):
+    """writes a csv containing SCF and Geopt convergence data"""
 
     csv_file = name + "_postmortem.csv"
     with open(csv_file, 'w', newline='') as w:
         writer = csv.writer(w)
-        writer.writerows(geopt_tolerance_table)
+        writer.writerows(tables.geopt_tolerance_table)
         writer.writerows(['\n'])
-        writer.writerows(geopt_convergence_table)
+        writer.writerows(tables.geopt_convergence_table)
         writer.writerows(['\n'])
-        writer.writerows(neg_freq_table)
+        writer.writerows(tables.neg_freq_table)
         writer.writerows(['\n'])
 
         writer.writerow(['last SCF data'])
-        for line in lines[scf_start + 2:scf_end+3]:
+        for line in tables.last_scf:
             if line.strip().startswith('*'):
                 writer.writerow([line.strip()])
             else:
@@ -121,13 +389,305 @@ def write_convergence_csv(lines, name):
 
     print(f'postmortem analysis written to {csv_file}')
 
+def read_tail(filename, n_bytes):
+    """returns the stripped lines in the last n_bytes of a file by seeking to the end of the file,
+    so the cost does not depend on the size of the file"""
+
+    with open(filename, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - n_bytes))
+        return [line.strip() for line in file.read().decode(errors='replace').splitlines()]
+
+
+def read_not_converged(mapped):
+    """returns True if the last optimization banner of a memory mapped .out file says it did not converge.
+    Jobs without an optimization keyword on their ! lines are not searched. Otherwise the results after the input
+    are searched backwards one window at a time, stopping at the first banner found, which is usually close to the
+    end (a frequency calculation can push it out of the tail)"""
+
+    start = mapped.find(INPUT_END)
+    if start == -1:
+        return False
+    inputs = mapped[:start].decode(errors='replace').lower().split('\n')
+    keywords = ' '.join(line.split('>', 1)[1] for line in inputs if '> !' in line).split()
+    if not any('opt' in keyword for keyword in keywords):
+        return False
+
+    window_end = len(mapped)
+    while window_end > start:
+        window_start = max(start, window_end - WINDOW)
+        # windows overlap by the length of a banner, so a banner split between two windows is still found
+        search_end = min(len(mapped), window_end + len(NOT_CONVERGED))
+        not_converged = mapped.rfind(NOT_CONVERGED, window_start, search_end)
+        converged = mapped.rfind(CONVERGED, window_start, search_end)
+        if not_converged != -1 or converged != -1:
+            return not_converged > converged
+        window_end = window_start
+    return False
+
+
+def check_out_file(filename):
+    """determines from the end of its .out file if a job is done, crashed, or did not terminate
+    (it is still running or was killed by SLURM). Jobs that terminated normally did not converge if their last
+    optimization banner says so (see read_not_converged())"""
+
+    tail = read_tail(filename, TAIL_BYTES)
+    if len(tail) > 1 and tail[-2] == TERMINATED:
+        with open(filename, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if read_not_converged(mapped):
+                    return 'not converged'
+        return 'done'
+    elif any(flag in line for line in tail for flag in CRASH_FLAGS):
+        return 'crashed'
+    return 'not terminated'
+
+
+def postmortem_out_file(filename, status):
+    """writes the postmortem .csv of a single failed job and returns its row of the overview table.
+    This is kept free of shared state so that it can run in a process pool"""
+
+    try:
+        tables = analyze_out_file(filename)
+        write_convergence_csv(tables, filename.split('.')[0])
+    except OSError as e:
+        print(f'Error with {filename}: {e}; Skipping file.')
+        return [filename, f'Error: {e}']
+
+    # the last geometry cycle, if there is one, and the tolerances of its convergence criteria
+    last_cycle = tables.geopt_convergence_table[-1] if len(tables.geopt_convergence_table) > 2 else []
+    last_cycle = last_cycle + [''] * (9 - len(last_cycle))
+    tolerances = tables.geopt_tolerance_table[2] if len(tables.geopt_tolerance_table) > 2 else [''] * 9
+    neg_freqs = str(tables.neg_freq_table[-1][1]) if len(tables.neg_freq_table) > 2 else ''
+
+    return [filename, status, last_cycle[0], last_cycle[2], last_cycle[5], tolerances[5], last_cycle[6],
+            tolerances[6], tables.last_scf_steps, neg_freqs]
+
+
+def print_table(table):
+    # Calculate the maximum width for each column
+    column_widths = [max(len(str(item)) for item in column) for column in zip(*table)]
+
+    # Print the table with left-aligned columns
+    for row in table:
+        formatted_row = "  ".join("{:<{width}}".format(item, width=width) for item, width in zip(row, column_widths))
+        print(formatted_row)
+
+
+def postmortem_all(options):
+    """finds every job in the current directory that did not terminate normally or did not converge
+    (see check_out_file()), writes the postmortem .csv of each in a process pool,
+    and writes an overview .csv with one row per failed job"""
+
+    orca_outs = sorted(entry.name for entry in os.scandir('.')
+                       if entry.name.endswith('.out') and 'slurm' not in entry.name)
+
+    failed = []
+    for filename in orca_outs:
+        try:
+            status = check_out_file(filename)
+        except OSError as e:
+            print(f'Error with {filename}: {e}; Skipping file.')
+            continue
+        if status != 'done':
+            failed.append((filename, status))
+
+    if not failed:
+        print(f'All {len(orca_outs)} jobs terminated normally and converged.')
+        return
+
+    filenames, statuses = zip(*failed)
+    n_workers = min(options.n_workers, len(failed))
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            rows = list(executor.map(postmortem_out_file, filenames, statuses))
+    else:
+        rows = [postmortem_out_file(filename, status) for filename, status in failed]
+
+    overview_table = [['file', 'status', 'last cycle', 'energy', 'RMS gradient', 'RMS gradient tol',
+                       'MAX gradient', 'MAX gradient tol', 'last SCF steps', 'neg freqs']] + rows
+    overview_file = f'{job_name}_postmortem_overview.csv'
+    with open(overview_file, 'w', newline='') as w:
+        writer = csv.writer(w)
+        writer.writerows(overview_table)
+
+    print()
+    print_table(overview_table)
+    print(f'{len(failed)} of {len(orca_outs)} jobs failed. Overview written to {overview_file}')
+
+
+def read_checkpoints():
+    """returns the checkpoint of every watched file from WATCH_FILE, or an empty dictionary
+    if there is none or it was written by another version of this script"""
+
+    try:
+        with open(WATCH_FILE, 'r') as file:
+            checkpoints = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(checkpoints, dict) or checkpoints.get('version') != version:
+        return {}
+    return checkpoints.get('files', {})
+
+
+def write_checkpoints(checkpoints):
+    """writes the checkpoints to WATCH_FILE by replacing it, so an interrupted write never corrupts it"""
+
+    temp_file = WATCH_FILE + '.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump({'version': version, 'files': checkpoints}, file)
+    os.replace(temp_file, WATCH_FILE)
+
+
+def watch_out_file(filename, checkpoint):
+    """parses the bytes written to a .out file since its checkpoint and returns the new checkpoint.
+    A checkpoint holds the offset of the first unparsed line, the size and time the file last grew,
+    and the states of its PostmortemParser and ConvergenceTables.
+    Files that shrank (e.g. a job was restarted) are parsed again from the start"""
+
+    size = os.path.getsize(filename)
+    if checkpoint is None or size < checkpoint['offset']:
+        checkpoint = {'offset': 0, 'size': 0, 'grew': time.time(),
+                      'parser': vars(PostmortemParser()), 'tables': vars(ConvergenceTables())}
+
+    parser = PostmortemParser()
+    parser.__dict__.update(checkpoint['parser'])
+    tables = ConvergenceTables()
+    tables.__dict__.update(checkpoint['tables'])
+
+    # only complete lines are parsed, so a line being written is parsed on the next poll
+    offset = checkpoint['offset']
+    if size > offset:
+        with open(filename, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                events, offset = feed_bytes(parser, mapped, offset, min(size, len(mapped)))
+        for event in events:
+            tables.add(event)
+
+    grew = time.time() if size > checkpoint['size'] else checkpoint['grew']
+    return {'offset': offset, 'size': size, 'grew': grew, 'parser': vars(parser), 'tables': vars(tables)}
+
+
+def to_floats(values):
+    """converts the numbers in values to floats and skips anything else"""
+    floats = []
+    for value in values:
+        try:
+            floats.append(float(value))
+        except (TypeError, ValueError):
+            pass
+    return floats
+
+
+def stuck_flags(checkpoint, idle):
+    """returns the reasons a running job looks stuck:
+    the energy change has flipped sign on nearly every recent cycle, the RMS gradient has not reached a new minimum
+    in the last few cycles, the SCF is taking too many iterations, or the .out file has not been written for a while"""
+
+    flags = []
+    cycles = checkpoint['tables']['geopt_convergence_table'][2:]
+    energy_changes = to_floats(row[3] for row in cycles if len(row) > 3)
+    rms_gradients = to_floats(row[5] for row in cycles if len(row) > 5)
+
+    recent = energy_changes[-STUCK_CYCLES:]
+    sign_flips = sum(1 for a, b in zip(recent, recent[1:]) if a * b < 0)
+    if len(recent) == STUCK_CYCLES and sign_flips >= STUCK_CYCLES - 2:
+        flags.append('energy oscillating')
+
+    if len(rms_gradients) > STUCK_CYCLES and min(rms_gradients[-STUCK_CYCLES:]) >= min(rms_gradients[:-STUCK_CYCLES]):
+        flags.append(f'gradient flat for {STUCK_CYCLES} cycles')
+
+    # the SCF being read has not finished, so its iterations so far are counted
+    scf = checkpoint['parser']['scf']
+    scf_steps = to_floats([scf['iterations'] if scf is not None else checkpoint['tables']['last_scf_steps']])
+    if scf_steps and scf_steps[0] >= SLOW_SCF:
+        flags.append(f'SCF at {scf_steps[0]:.0f} iterations')
+
+    if idle >= IDLE_MINUTES:
+        flags.append(f'no output for {idle:.0f} min')
+
+    return flags
+
+
+def watch_row(filename, checkpoint, status):
+    """formats the row of a watched job"""
+
+    cycles = checkpoint['tables']['geopt_convergence_table'][2:]
+    last_cycle = cycles[-1] + [''] * (9 - len(cycles[-1])) if cycles else [''] * 9
+
+    # the RMS gradient trend compares the last RMS gradient to the one 3 cycles earlier
+    rms_gradients = [row[5] for row in cycles if len(row) > 5 and to_floats([row[5]])]
+    gradient = rms_gradients[-1] if rms_gradients else ''
+    if len(rms_gradients) > 3 and float(rms_gradients[-4]) > 0:
+        ratio = float(rms_gradients[-1]) / float(rms_gradients[-4])
+        gradient += ' falling' if ratio < 0.8 else ' rising' if ratio > 1.25 else ' flat'
+
+    scf_steps = ' '.join(str(row[1]) for row in cycles[-5:] if len(row) > 1 and row[1] != '')
+
+    idle = (time.time() - checkpoint['grew']) / 60
+    flags = stuck_flags(checkpoint, idle) if status == 'not terminated' else []
+    return [filename, status, last_cycle[0], last_cycle[2], last_cycle[3], gradient,
+            scf_steps, f'{idle:.0f} min ago', ', '.join(flags)]
+
+
+def watch(options):
+    """polls the .out files of the current directory (or a single .out file) every options.interval seconds,
+    parsing only the bytes written since the last poll, and prints the progress of each job.
+    Checkpoints are saved after every poll, so stopping and restarting the watch does not parse files again"""
+
+    try:
+        while True:
+            if options.filename is not None:
+                orca_outs = [options.filename]
+            else:
+                orca_outs = sorted(entry.name for entry in os.scandir('.')
+                                   if entry.name.endswith('.out') and 'slurm' not in entry.name)
+
+            checkpoints = read_checkpoints()
+            watch_table = [['file', 'status', 'cycle', 'energy', 'energy change', 'RMS gradient',
+                            'SCF steps (last 5)', 'last written', 'flags']]
+            n_stuck = 0
+            for filename in orca_outs:
+                try:
+                    checkpoints[filename] = watch_out_file(filename, checkpoints.get(filename))
+                    status = check_out_file(filename)
+                except (OSError, ValueError) as e:
+                    print(f'Error with {filename}: {e}; Skipping file.')
+                    continue
+                row = watch_row(filename, checkpoints[filename], status)
+                n_stuck += bool(row[-1])
+                watch_table.append(row)
+            write_checkpoints(checkpoints)
+
+            print(f'\n{time.strftime("%H:%M:%S")}  {len(orca_outs)} jobs, {n_stuck} flagged')
+            print_table(watch_table)
+
+            if options.once:
+                break
+            time.sleep(options.interval)
+    except KeyboardInterrupt:
+        print()
+
+
 if __name__ == '__main__':
-    if sys.argv[1] == '-v' or sys.argv[1] == '-version':
-        print(f'orca_postmortem version {version}')
-        sys.exit(0)
-
-    filename = sys.argv[1]
-    with open(filename, 'r') as r:
-        out_lines = r.readlines()
-    summary_file = filename.split('.')[0]
-    write_convergence_csv(out_lines, summary_file)
+    TAIL_BYTES = 16384
+    TERMINATED = '****ORCA TERMINATED NORMALLY****'
+    NOT_CONVERGED = b'The optimization did not converge'
+    CONVERGED = b'THE OPTIMIZATION HAS CONVERGED'
+    INPUT_END = b'****END OF INPUT****'
+    WINDOW = 1 << 20
+    CRASH_FLAGS = ('ORCA finished by error termination', 'aborting the run', 'ABORTING THE RUN', 'mpirun noticed')
+    WATCH_FILE = '.orca_watch.json'
+    STUCK_CYCLES = 6
+    SLOW_SCF = 60
+    IDLE_MINUTES = 30
+
+    job_name = os.path.basename(os.getcwd())
+    options = Options(sys.argv[1:])
+    if options.batch:
+        postmortem_all(options)
+    elif options.watch:
+        watch(options)
+    else:
+        summary_file = options.filename.split('.')[0]
+        write_convergence_csv(analyze_out_file(options.filename), summary_file)
@@ -8,7 +8,11 @@ It also creates a shell script for visualizing the negative frequencies
 For scan jobs, this script also processes relaxscanact.dat files
 and reformats the .allxyz files so that they can be opened by maestro.
 For the scan data, [coordinate, abs energy (a.u.), rel energy (kcal/mol), step (kcal/mol), type]
-are tabulated, where type is edge, min, or max
+are tabulated, where type is edge, min, or max. Spline estimates of the mins, maxes, and barrier are tabulated below
+
+With the -calibrate flag, the atom composition, command line, number of cores, %maxcore, and cost of every
+finished job below the working directory are instead recorded in a cost model file,
+which launch_orca_4 uses to predict the walltime of new jobs and to reuse their %maxcore requests.
 
 It also reads the directory name and uses it as a constant.
 """
@@ -32,6 +36,39 @@ Version Initials    Date            Summary
 2.2                                 from being run on the head node.
 3.0     ARS         31-Jul-2023     performs processing of scan jobs, skips outfiles with problems
 4.0     ARS         29-Aug-2023     minor bugs addressed, no longer overwrites existing files, small reformatting performed
+4.1     ARS         16-Oct-2026     .out files are read in a single streaming pass by the OutParser state machine
+4.1                                 instead of readlines() and repeated searches. The .csv file is unchanged.
+4.2     ARS         16-Oct-2026     added -parallel flag and worker count argument to process .out files in a process pool.
+4.2                                 .out files are now always processed and tabulated in file name order.
+4.3     ARS         16-Oct-2026     parsed results are cached in .process_orca_cache.json and only new or changed .out files
+4.3                                 are parsed. The summary .csv is updated in place instead of creating _summary_n.csv files.
+4.3                                 added -fresh flag to ignore the cache.
+4.4     ARS         16-Oct-2026     added -triage flag, which reports done, crashed, and running jobs from the first and last
+4.4                                 few kB of each .out file without parsing them
+4.5     ARS         16-Oct-2026     E, H, G, the frequency table, and geometry convergence are found by reverse regex searches
+4.5                                 of the memory mapped .out file (MappedOutput) instead of streaming the whole file
+4.6     ARS         16-Oct-2026     added -recursive flag, which processes every job directory below the working directory
+4.6                                 in parallel and writes one {job_name}_campaign_summary.csv with a job directory column.
+4.6                                 Directories that are unchanged since the last crawl are skipped.
+4.7     ARS         16-Oct-2026     every job is upserted into the sqlite database ~/carrow_results.db (or $CARROW_RESULTS_DB)
+4.7                                 which can be searched with query_orca
+4.8     ARS         16-Oct-2026     scans are analyzed with numpy. Plateaus are labeled once at their first point and 2 point
+4.8                                 scans now label both edges. A natural cubic spline estimates the coordinate and energy of
+4.8                                 each min and max between grid points, as well as the barrier, which are added to the scan data
+4.9     ARS         16-Oct-2026     .allxyz files are rewritten one frame at a time and the frame offsets are saved to .all.xyz.idx
+4.9                                 added -frames flag, which writes the min and max frames of scans as standalone .xyz files
+5.0     ARS         16-Oct-2026     multi-job ($new_job) .out files are no longer skipped. They are split into their jobs in a single
+5.0                                 streaming pass, and each job gets its own row. The cost of each job is taken from its timings
+5.1     ARS         16-Oct-2026     neg_freqs.sh runs orca_pltvib on several modes at a time and skips modes that were already
+5.1                                 visualized. The SLURM version requests one core per negative frequency (up to 32)
+5.2     ARS         16-Oct-2026     added -calibrate flag, which records a sample of every finished job below the working
+5.2                                 directory in ~/.carrow_cost_model.json (or $CARROW_COST_MODEL) for launch_orca_4
+5.3     ARS         16-Oct-2026     -calibrate reads scan steps written as floats, skips only the jobs it cannot read,
+5.3                                 and lists the .out files it could not read
+5.4     ARS         16-Oct-2026     the command line of a job joins all of its ! lines, so -calibrate samples are keyed
+5.4                                 the same way as in launch_orca_4
+5.5     ARS         16-Oct-2026     memory mapped .out files take their inputs from the last input block, like their
+5.5                                 results
 """
 version = edit_history.strip().split('\n')[-1].split()[0]
 
@@ -39,106 +76,691 @@ version = edit_history.strip().split('\n')[-1].split()[0]
 import os
 import sys
 import csv
+import json
+import time
+import mmap
+import re
+import sqlite3
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+class Options(object):
+    """holds the command line options of process_orca_4
+    arguments are contextually interpreted, so they may be passed in any order"""
+
+    def __init__(self, arg_list):
+        self.n_workers = 1
+        self.parallel = False
+        self.fresh = False
+        self.triage = False
+        self.recursive = False
+        self.frames = False
+        self.calibrate = False
+
+        self.parse_args(arg_list)
+
+    @staticmethod
+    def generate_std_error(error_message=''):
+        """Standard error message and exit command"""
+        if error_message:
+            print(f'Error: {error_message}')
+        print('Usage: process_orca_4 [-parallel] [n_workers] [-fresh] [-triage] [-recursive] [-frames] [-calibrate]')
+        print('Use "process_orca_4 -help" for the manual')
+        sys.exit(1)
+
+    def parse_args(self, arg_list):
+        """parses command line arguments to determine the number of worker processes, if the cache is ignored,
+        and which mode is used. A bare integer is the number of workers,
+        and -parallel, -recursive, or -calibrate without one uses every available core"""
+
+        n_workers = None
+        for arg in arg_list:
+            if arg.isdigit():
+                if n_workers is None and int(arg) > 0:
+                    n_workers = int(arg)
+                else:
+                    self.generate_std_error(f'{arg} is not a valid number of workers')
+            elif arg.lower() in ('-p', '-parallel'):
+                self.parallel = True
+            elif arg.lower() in ('-f', '-fresh'):
+                self.fresh = True
+            elif arg.lower() in ('-t', '-triage'):
+                self.triage = True
+            elif arg.lower() in ('-r', '-recursive'):
+                self.recursive = True
+            elif arg.lower() in ('-fr', '-frames'):
+                self.frames = True
+            elif arg.lower() in ('-c', '-calibrate'):
+                self.calibrate = True
+            elif arg.lower() in ('-v', '-version'):
+                print(f'process_orca_4 version {version}')
+                sys.exit(0)
+            else:
+                self.generate_std_error(f'{arg} not recognized')
+
+        if n_workers is not None:
+            self.n_workers = n_workers
+        elif self.parallel or self.recursive or self.calibrate:
+            self.n_workers = os.cpu_count() or 1
+
+
+def file_signature(filename):
+    """returns the size and modification time of a file, which are used to detect changed .out files"""
+
+    stats = os.stat(filename)
+    return [stats.st_size, stats.st_mtime_ns]
+
+
+def read_cache(directory, options):
+    """reads the parse cache of a job directory, which maps each .out file name to its signature and result.
+    Returns an empty cache if the cache is missing, unreadable, written by another version of this script,
+    or if the -fresh flag is used"""
+
+    cache_file = os.path.join(directory, CACHE_FILE)
+    if options.fresh or not os.path.exists(cache_file):
+        return {}
+
+    try:
+        with open(cache_file, 'r') as file:
+            cache = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        print(f'Warning: {cache_file} could not be read. Every .out file will be parsed.')
+        return {}
+
+    if cache.get('version') != version:
+        return {}
+    return cache.get('files', {})
+
+
+def write_cache(directory, files):
+    """writes the parse cache of a job directory
+    a temporary file is renamed over the old cache so an interrupted run cannot leave a corrupted cache"""
+
+    cache_file = os.path.join(directory, CACHE_FILE)
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump({'version': version, 'files': files}, file)
+    os.replace(temp_file, cache_file)
+
+
+def list_out_files(directory):
+    """returns the names of the .out files in a directory in file name order"""
+    return sorted(entry.name for entry in os.scandir(directory) if entry.name.endswith('.out'))
+
+
+class OrcaOutput(object):
+    """Holds the data extracted from a single orca .out file, or from a single job of a multi-job .out file.
+    Every attribute is populated by OutParser.close()"""
+
+    def __init__(self):
+        self.inputs = None
+        self.multiple_jobs = False
+        self.subjobs = None
+        self.commands = None
+        self.ncores = None
+        self.charge = ''
+        self.spin = ''
+        self.freq = False
+        self.job_type = None
+        self.terminated = False
+        self.cost = 'N/A'
+        self.E = None
+        self.H = None
+        self.G = None
+        self.frequencies = None
+        self.geom_converged = False
+
+
+class OutParser(object):
+    """State machine which reads an orca .out file exactly once as a stream of lines.
+    Lines are passed one at a time to feed() and close() returns an OrcaOutput.
+    Only the input block, the most recent energy lines, and the most recent frequency block are held in memory,
+    so memory use does not grow with the size of the .out file.
+
+    The states are 'header' (before the input block), 'input' (inside the input block),
+    'results' (after ****END OF INPUT****) and 'terminated' (after ****ORCA TERMINATED NORMALLY****).
+    Results are only taken from the last input block of the file, and the last line of an unfinished file
+    is never treated as a result because it may still be being written.
+
+    In multi-job ($new_job) files, the results are split into one set per job at each JOB NUMBER line,
+    and close() returns an OrcaOutput whose subjobs hold one OrcaOutput per job."""
+
+    INPUT_START = 'INPUT FILE'
+    INPUT_END = '****END OF INPUT****'
+    TERMINATED = '****ORCA TERMINATED NORMALLY****'
+    ENERGY_FLAGS = {'E': ('FINAL SINGLE POINT ENERGY', -1),
+                    'H': ('Total enthalpy', -2),
+                    'G': ('Final Gibbs free energy', -2)}
+    HESSIAN = 'Writing the Hessian file to the disk'
+    NORMAL_MODES = 'NORMAL MODES'
+    CONVERGED = '***        THE OPTIMIZATION HAS CONVERGED     ***'
+    NEW_JOB = '$new_job'
+    JOB_NUMBER = 'JOB NUMBER'
+    TIMINGS = 'Sum of individual times'
+
+    # the frequency table starts 11 lines after HESSIAN and ends 3 lines before NORMAL_MODES
+    FREQ_START = 11
+    FREQ_END = 3
+
+    def __init__(self):
+        self.output = OrcaOutput()
+        self.state = 'header'
+        self.n_lines = 0
+        self.last_lines = [None, None]
+
+        # lines to skip before the current section starts
+        self.skip = 0
+
+        self.input_lines = []
+        self.energy_lines = {}
+        self.freq_lines = None
+        self.freq_offset = None
+        self.frequency_block = None
+        self.geom_converged = False
+        self.seconds = None
+        self.subjob_results = []
+
+    def feed(self, line):
+        """Reads the next line of the .out file.
+        Lines are processed one line late so that the last line of the file is never treated as a result"""
+
+        line = line.strip()
+        self.n_lines += 1
+
+        if self.NEW_JOB in line.lower():
+            self.output.multiple_jobs = True
+
+        # processes the line that is now known not to be the last line
+        if self.last_lines[1] is not None:
+            self.process_line(self.last_lines[1])
+        self.last_lines = [self.last_lines[1], line]
+
+    def process_line(self, line):
+        """advances the state machine by one line"""
+
+        if line.endswith(self.INPUT_START):
+            self.state = 'input'
+            self.input_lines = []
+            self.skip = 2
+            return
+
+        if line.endswith(self.INPUT_END):
+            if self.state == 'input':
+                self.output.inputs = self.input_lines
+            self.start_results()
+            return
+
+        if self.skip:
+            self.skip -= 1
+        elif self.state == 'input':
+            self.input_lines.append(line)
+        elif self.state == 'results':
+            self.process_result(line)
+
+    def start_results(self):
+        """resets the results, which are only taken from after the last ****END OF INPUT****"""
+
+        self.state = 'results'
+        self.skip = 2
+        self.energy_lines = {}
+        self.freq_lines = None
+        self.freq_offset = None
+        self.frequency_block = None
+        self.geom_converged = False
+        self.seconds = None
+        self.subjob_results = []
+
+    def finish_subjob(self):
+        """stores the results of the current job of a multi-job file and resets them for the next job"""
+
+        self.subjob_results.append((self.energy_lines, self.frequency_block, self.geom_converged, self.seconds))
+        self.energy_lines = {}
+        self.freq_lines = None
+        self.freq_offset = None
+        self.frequency_block = None
+        self.geom_converged = False
+        self.seconds = None
+
+    def process_result(self, line):
+        """records the most recent energies, frequency table, and convergence of the results section"""
+
+        if line.endswith(self.TERMINATED):
+            self.state = 'terminated'
+            return
+
+        # each job after the first of a multi-job file starts with a line like $$$$$ JOB NUMBER  2 $$$$$
+        if line.startswith('$$$') and self.JOB_NUMBER in line:
+            self.finish_subjob()
+            return
+
+        # the run time of each job, which is needed to split the cost of multi-job files
+        if line.startswith(self.TIMINGS):
+            try:
+                self.seconds = float(line.split()[5])
+            except (IndexError, ValueError):
+                pass
+
+        for key, (flag, index) in self.ENERGY_FLAGS.items():
+            if line.startswith(flag):
+                self.energy_lines[key] = line
+
+        # collects the frequency table following the most recent hessian
+        if self.HESSIAN in line:
+            self.freq_lines = []
+            self.freq_offset = 0
+            self.frequency_block = None
+        elif self.freq_offset is not None:
+            self.freq_offset += 1
+            if self.NORMAL_MODES in line:
+                self.frequency_block = self.freq_lines[:max(0, self.freq_offset - self.FREQ_START - self.FREQ_END)]
+                self.freq_lines = None
+                self.freq_offset = None
+            elif self.freq_offset >= self.FREQ_START:
+                self.freq_lines.append(line)
+
+        if self.CONVERGED in line:
+            self.geom_converged = True
+
+    def close(self):
+        """Interprets the parsed sections and returns the populated OrcaOutput.
+        Raises the same kinds of errors that process_out_files() skips files for"""
+
+        out = self.output
+
+        # slices inputs and removes the '|  #>'
+        if out.inputs is None:
+            raise TypeError('no complete input block was found')
+        out.inputs = [line[line.index('>') + 2:] for line in out.inputs]
+
+        if out.multiple_jobs:
+            return self.close_subjobs()
+
+        self.interpret_inputs(out, out.inputs)
+
+        # determines if job finished correctly and then determines the cost from the timing line
+        hours = self.run_time()
+        if hours is not None:
+            out.terminated = True
+            out.cost = int(out.ncores) * hours
+
+        # scans are summarized from their .relaxscanact.dat files instead
+        if out.job_type == 'scan':
+            return out
+
+        self.interpret_results(out, self.energy_lines, self.frequency_block, self.geom_converged)
+        return out
+
+    def close_subjobs(self):
+        """Interprets a multi-job file as one OrcaOutput per job, which are returned as the subjobs of the OrcaOutput.
+        Jobs that leave out %pal or the coordinates use those of the previous job, as orca does.
+        The cost of each job is found from its timings. If the last job has none, it is given the rest of the
+        total run time of the file. Jobs that never started are still returned, with no results"""
+
+        out = self.output
+
+        # splits the input block at each $new_job
+        subjob_inputs = [[]]
+        for line in out.inputs:
+            if line.strip().lower().startswith(self.NEW_JOB):
+                subjob_inputs.append([])
+            else:
+                subjob_inputs[-1].append(line)
+
+        out.subjobs = []
+        previous = None
+        for inputs in subjob_inputs:
+            subjob = OrcaOutput()
+            subjob.inputs = inputs
+            self.interpret_inputs(subjob, inputs, previous)
+            out.subjobs.append(subjob)
+            previous = subjob
+
+        hours = self.run_time()
+        self.finish_subjob()
+        n_started = len(self.subjob_results)
+        accounted_hours = 0
+        for i, subjob in enumerate(out.subjobs):
+            if i >= n_started:
+                break
+            energy_lines, frequency_block, geom_converged, seconds = self.subjob_results[i]
+
+            # every job but the last one of the file finished, since a later job started
+            last = (i == n_started - 1)
+            subjob.terminated = not last or hours is not None
+            if seconds is not None:
+                subjob.cost = int(subjob.ncores) * seconds / 3600
+                accounted_hours += seconds / 3600
+            elif last and hours is not None:
+                subjob.cost = int(subjob.ncores) * max(0, hours - accounted_hours)
+
+            if subjob.job_type != 'scan':
+                self.interpret_results(subjob, energy_lines, frequency_block, geom_converged)
+
+        if hours is not None:
+            out.terminated = True
+        return out
+
+    @staticmethod
+    def interpret_inputs(out, inputs, previous=None):
+        """finds the commands, ncores, freq, charge, spin, and job type of a job from its input lines
+        Settings missing from a job of a multi-job file are taken from the previous job"""
+
+        # finds commands, ncores, freq
+        # keywords may be split across several ! lines, which are joined as launch_orca_4 does (see describe_job())
+        command_lines = [line for line in inputs if line.startswith('!')]
+        ncores = next((line for line in inputs if line.lower().startswith('%pal nprocs')), None)
+        if not command_lines:
+            raise TypeError('no ! line was found in the input block')
+        commands = ' '.join(command_lines)
+        if ncores is None and previous is None:
+            raise ValueError('no %pal nprocs line was found in the input block')
+        out.commands = commands.lower()
+        out.ncores = ncores.split()[2] if ncores is not None else previous.ncores
+        out.freq = ('freq' in out.commands)
+
+        # finds charge and spin from the coordinate line (e.g. * xyzfile 0 1 name_in.xyz) if there is one
+        if previous is not None:
+            out.charge, out.spin = previous.charge, previous.spin
+        for line in inputs:
+            parts = line.split()
+            if line.startswith('*') and len(parts) > 3:
+                try:
+                    out.charge, out.spin = int(parts[2]), int(parts[3])
+                except ValueError:
+                    pass
+                break
 
+        # determines job type
+        if any(line.lower().startswith('%geom scan') for line in inputs):
+            out.job_type = 'scan'
+        elif 'opt' in out.commands:
+            out.job_type = 'opt'
+        elif 'optts' in out.commands:
+            out.job_type = 'optTS'
+        else:
+            out.job_type = 'SP'
+
+    def run_time(self):
+        """returns the total run time in hours from the timing line if the file terminated normally, otherwise None"""
+
+        if self.n_lines < 2:
+            raise IndexError('the .out file is too short')
+        second_last, last = self.last_lines
+        if second_last == self.TERMINATED:
+            timing = last.split()
+            days, hours, mins, secs = map(float, (timing[3], timing[5], timing[7], timing[9]))
+            return 24*days + hours + mins/60 + secs/3600
+        return None
 
-def get_available_filename(filename):
-    """This function was defined by ChatGPT
-    This function takes a desired fileneame (e.g. filename.ext)
-    checks if this filename is already in use
-    and if it is, renames (e.g. filename_n.ext)
-    where n is the first integer that maps to an unused filename"""
+    def interpret_results(self, out, energy_lines, frequency_block, geom_converged):
+        """stores the energies, frequencies, and geometry convergence of a job in out"""
+
+        # in the event of a crashed job, the energies and frequencies will be None
+        for key, (flag, index) in self.ENERGY_FLAGS.items():
+            if key == 'E' or out.freq:
+                energy_line = energy_lines.get(key)
+                setattr(out, key, energy_line.split()[index] if energy_line else None)
+        if out.freq and frequency_block:
+            out.frequencies = [(line.split()[0][:-1], float(line.split()[1])) for line in frequency_block]
+        out.geom_converged = geom_converged
+
+
+class MappedOutput(object):
+    """Extracts the results of an orca .out file from a memory mapped copy of the file.
+    Every marker is found with a precompiled byte regex, and the most recent marker is found by searching
+    backwards from the end of the results one window at a time. Markers are usually near the end of the file,
+    so only the last few windows of the file are read and memory use does not depend on the size of the file.
+    The extracted lines are handed to an OutParser so that they are interpreted exactly as when streaming"""
+
+    WINDOW = 1 << 20
+
+    PATTERNS = {
+        'E': re.compile(rb'^[ \t]*FINAL SINGLE POINT ENERGY[^\n]*', re.M),
+        'H': re.compile(rb'^[ \t]*Total enthalpy[^\n]*', re.M),
+        'G': re.compile(rb'^[ \t]*Final Gibbs free energy[^\n]*', re.M),
+    }
+    HESSIAN = re.compile(rb'^[^\n]*Writing the Hessian file to the disk[^\n]*', re.M)
+    NORMAL_MODES = re.compile(rb'^[^\n]*NORMAL MODES[^\n]*', re.M)
+    CONVERGED = re.compile(rb'\*\*\*        THE OPTIMIZATION HAS CONVERGED     \*\*\*')
+    INPUT_START = b'INPUT FILE'
+    INPUT_END = b'****END OF INPUT****'
+    TERMINATED = b'****ORCA TERMINATED NORMALLY****'
+
+    def __init__(self, mapped):
+        self.mapped = mapped
+        # the end of the last input block, which both the inputs and the results are taken from
+        self.input_end = mapped.rfind(self.INPUT_END)
+
+    def line_start(self, position):
+        """returns the position of the start of the line containing position"""
+        return self.mapped.rfind(b'\n', 0, position) + 1
+
+    def input_start(self):
+        """returns the position of the start of the title line of the last input block, or 0 if there is none"""
+
+        if self.input_end == -1:
+            return 0
+        start = self.mapped.rfind(self.INPUT_START, 0, self.input_end)
+        return self.line_start(start) if start != -1 else 0
+
+    def last_match(self, pattern, start, end):
+        """returns the last match of a compiled pattern between start and end, or None
+        windows always begin at the start of a line so that '^' behaves as it would for the whole file"""
+
+        window_end = end
+        while window_end > start:
+            window_start = max(start, self.line_start(window_end - self.WINDOW))
+            if window_start >= window_end:
+                window_start = start
+            match = None
+            for match in pattern.finditer(self.mapped, window_start, window_end):
+                pass
+            if match:
+                return match
+            window_end = window_start
+        return None
 
-    base, ext = os.path.splitext(filename)
-    n = 1
-    new_filename = filename
+    def read_results(self, parser):
+        """finds the results section, termination, energies, frequency table, and convergence of a single job
+        and stores them in parser as if the whole file had been fed to it"""
+
+        mapped = self.mapped
+        size = len(mapped)
+
+        # the two last lines decide whether the job terminated normally, as in OutParser.close()
+        last_start = self.line_start(size - 1)
+        second_last_start = self.line_start(max(0, last_start - 1))
+        last_lines = [line.decode(errors='replace').strip()
+                      for line in (mapped[second_last_start:last_start], mapped[last_start:size])]
+        parser.last_lines = last_lines
+        parser.n_lines = 1 if last_start == 0 else 2
+
+        # results start 3 lines after the last ****END OF INPUT**** and stop at the termination line
+        # or at the last line of the file, which may still be being written
+        start = self.input_end
+        for _ in range(3):
+            start = mapped.find(b'\n', start) + 1
+        end = last_start
+        if last_lines[0] == OutParser.TERMINATED:
+            end = self.line_start(mapped.find(self.TERMINATED, start))
+        if not 0 < start <= end:
+            return
+
+        for key, pattern in self.PATTERNS.items():
+            match = self.last_match(pattern, start, end)
+            if match:
+                parser.energy_lines[key] = match.group().decode(errors='replace').strip()
+
+        # the frequency table follows the last hessian and ends before the next NORMAL MODES
+        hessian = self.last_match(self.HESSIAN, start, end)
+        if hessian:
+            normal_modes = self.NORMAL_MODES.search(mapped, hessian.end(), end)
+            if normal_modes:
+                lines = mapped[hessian.start():normal_modes.start()].decode(errors='replace').split('\n')[:-1]
+                end_index = max(OutParser.FREQ_START, len(lines) - OutParser.FREQ_END)
+                parser.frequency_block = [line.strip() for line in lines[OutParser.FREQ_START:end_index]]
+
+        parser.geom_converged = self.last_match(self.CONVERGED, start, end) is not None
+
+
+def parse_out_file(filename):
+    """Reads an orca .out file and returns the resulting OrcaOutput.
+    The last input block is streamed through OutParser, then the results after it are found in the memory mapped file
+    by MappedOutput, so usually only the input block and the end of the file are read. Appended or restarted files
+    therefore take their inputs and results from the same run.
+    Files that cannot be memory mapped (e.g. empty files) are streamed through OutParser in full,
+    as are multi-job files, whose results have to be split into jobs"""
+
+    parser = OutParser()
+    with open(filename, 'rb') as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            mapped = None
+
+        if mapped is None:
+            for line in file:
+                parser.feed(line.decode(errors='replace'))
+            return parser.close()
+
+        with mapped:
+            mapped_output = MappedOutput(mapped)
+            mapped.seek(mapped_output.input_start())
+            while parser.state != 'results':
+                line = mapped.readline()
+                if not line:
+                    break
+                parser.feed(line.decode(errors='replace'))
+            if parser.output.multiple_jobs:
+                for line in iter(mapped.readline, b''):
+                    parser.feed(line.decode(errors='replace'))
+            elif parser.state == 'results':
+                mapped_output.read_results(parser)
+
+    return parser.close()
+
+
+def read_tail(filename, n_bytes):
+    """returns the stripped lines in the last n_bytes of a file by seeking to the end of the file,
+    so the cost does not depend on the size of the file.
+    The first line is dropped if the file is longer than n_bytes, as it is probably incomplete"""
+
+    with open(filename, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(max(0, size - n_bytes))
+        lines = file.read().decode(errors='replace').splitlines()
+
+    if size > n_bytes:
+        lines = lines[1:]
+    return [line.strip() for line in lines]
+
+
+def read_ncores(filename, n_bytes):
+    """finds %pal nprocs in the input block echoed at the top of a .out file by reading only the first n_bytes
+    Returns None if it is not found"""
+
+    with open(filename, 'rb') as file:
+        lines = file.read(n_bytes).decode(errors='replace').splitlines()
+
+    for line in lines:
+        if '>' in line:
+            line = line[line.index('>') + 2:].strip().lower()
+            if line.startswith('%pal nprocs'):
+                return line.split()[2]
+    return None
+
+
+def triage_out_file(filename):
+    """determines if a job is done, crashed, or still running from the end of its .out file
+    Returns the status, the TOTAL RUN TIME, the cost in cpu*hr, and the minutes since the file was last written.
+    Jobs killed by SLURM (e.g. walltime) have no error message and look like running jobs that stopped writing."""
+
+    TAIL_BYTES = 4096
+    HEAD_BYTES = 65536
+    CRASH_FLAGS = ('ORCA finished by error termination', 'aborting the run', 'ABORTING THE RUN', 'mpirun noticed')
+
+    tail = read_tail(filename, TAIL_BYTES)
+    idle = (time.time() - os.path.getmtime(filename)) / 60
+
+    run_time, cost = '', ''
+    if len(tail) > 1 and tail[-2] == OutParser.TERMINATED:
+        status = 'done'
+        timing = tail[-1].split()
+        try:
+            days, hours, mins, secs = map(float, (timing[3], timing[5], timing[7], timing[9]))
+            run_time = f'{int(days)}d {int(hours)}h {int(mins)}m {int(secs)}s'
+            ncores = read_ncores(filename, HEAD_BYTES)
+            cost = int(ncores) * (24*days + hours + mins/60 + secs/3600) if ncores else 'N/A'
+        except (IndexError, ValueError):
+            run_time = 'unreadable'
+    elif any(flag in line for line in tail for flag in CRASH_FLAGS):
+        status = 'crashed'
+    else:
+        status = 'running'
 
-    # Check if the initial filename exists
-    while os.path.exists(new_filename):
-        new_filename = f"{base}_{n}{ext}"
-        n += 1
+    return status, run_time, cost, idle
 
-    return new_filename
 
+def triage_out_files():
+    """prints the status of every .out file in the current directory without parsing them"""
 
-def cut_section(inlines, start=None, start_shift=0, end=None, end_shift=0):
-    """Slices a list of strings (inlines) based on start and end flags.
-    The start flag is searched for from the bottom of the file.
-    the end flag is searched for starting from the last start flag
-    The start_shift and end_shift parameters allow shifting the slice inward or outward.
-    if start or end are not found, then the function returns None"""
+    orca_outs = sorted(entry.name for entry in os.scandir('.')
+                       if entry.name.endswith('.out') and 'slurm' not in entry.name)
 
-    if start:
-        start_index = None
-        # search inlines for 'start' in reverse direction
-        for i in reversed(range(len(inlines))):
-            if start in inlines[i]:
-                start_index = i
-                break
-        if not start_index:
-            return None
-    else:
-        start_index = 0
-
-    if end:
-        end_index = None
-        # search inlines for first 'end' after last 'start'
-        for i in range(start_index, len(inlines)):
-            if end in inlines[i]:
-                end_index = i
-                break
-        if not end_index:
-            return None
-    else:
-        end_index = -1
-    return inlines[start_index - start_shift: end_index + end_shift]
-
-
-def find_in(lines, starts_with, direction='f', case=True):
-    """Returns the first line in a set of lines (lines) that starts with a specified string (starts_with).
-    By default, it searches in the forward direction, but setting direction='r' reverses the behavior.
-    By default, is case sensitive, but can be set to case insensitive
-    Returns None if the string is not found."""
-
-    if case:
-        if direction == 'f':
-            for line in lines:
-                if line.startswith(starts_with):
-                    return line
-        elif direction == 'r':
-            for line in reversed(lines):
-                if line.startswith(starts_with):
-                    return line
-    else:
-        if direction == 'f':
-            for line in lines:
-                if line.lower().startswith(starts_with.lower()):
-                    return line
-        elif direction == 'r':
-            for line in reversed(lines):
-                if line.lower().startswith(starts_with.lower()):
-                    return line
-
-
-def extract_energy(lines, flag, index):
-    """Extracts energy (E, H, or G) from lines using the specified flag and index.
-    It searches in the reverse direction to get the most recent data."""
-
-    energy_line = find_in(lines, flag, direction='r')
-    if not energy_line:
-        return None
-    energy = energy_line.split()[index]
-    return energy 
+    triage_table = [['file', 'status', 'run time', 'cost (cpu*hr)', 'last written']]
+    counts = {'done': 0, 'crashed': 0, 'running': 0}
+    for filename in orca_outs:
+        try:
+            status, run_time, cost, idle = triage_out_file(filename)
+        except OSError as e:
+            print(f'Error with {filename}: {e}; Skipping file.')
+            continue
+        counts[status] += 1
+        if isinstance(cost, float):
+            cost = f'{cost:.2f}'
+        triage_table.append([filename, status, run_time, cost, f'{idle:.0f} min ago'])
+
+    print_table(triage_table)
+    print(f"{counts['done']} done, {counts['crashed']} crashed, {counts['running']} running or killed")
+
+
+def print_table(table):
+    # Calculate the maximum width for each column
+    column_widths = [max(len(str(item)) for item in column) for column in zip(*table)]
+
+    # Print the table with left-aligned columns
+    for row in table:
+        formatted_row = "  ".join("{:<{width}}".format(item, width=width) for item, width in zip(row, column_widths))
+        print(formatted_row)
 
 
 def neg_freq_file(neg_freq_info, job_name):
     """writes the .sh file for visualizing negative frequencies if there are any
-    Will prevent running the file outside of sbatch if there are excessive negative frequencies"""
+    orca_pltvib is run on several modes at a time with xargs, and modes whose .xyz file already exists are skipped,
+    so rerunning the file is free. Excessive negative frequencies are only run through sbatch,
+    in which case the job requests one core per negative frequency"""
     
     MAX_LENGTH = 10
-
-    orca_pltvib = ''
-    for row in neg_freq_info:
-        orca_pltvib += f'orca_pltvib {row[0]}.hess {row[1]}\n'
+    HEAD_NODE_WORKERS = 4
+    MAX_CORES = 32
+
+    modes = '\n'.join(f'{row[0]} {row[1]}' for row in neg_freq_info)
+    n_cores = min(len(neg_freq_info), MAX_CORES)
+
+    # orca_pltvib writes {name}.hess.v{mode:03d}.xyz
+    pool = f"""# visualizes a single mode unless it was already visualized
+visualize() {{
+    if [ ! -f "$1.hess.v$(printf '%03d' "$2").xyz" ]; then
+        orca_pltvib "$1.hess" "$2"
+    fi
+}}
+export -f visualize
+
+# runs up to n_workers modes at a time
+echo "{modes}" | xargs -P "$n_workers" -L 1 bash -c 'visualize "$@"' _
+"""
 
     if len(neg_freq_info) < MAX_LENGTH:
         shell_file = f"""#!/bin/bash
@@ -149,7 +771,8 @@ module add orca
 echo "There are {len(neg_freq_info)} negative frequencies.
 Executing neg_freqs.sh"
 
-{orca_pltvib}
+n_workers={min(len(neg_freq_info), HEAD_NODE_WORKERS)}
+{pool}
 #This shell file was created with {os.path.basename(__file__)} and extracted from {job_name}/'
 """
     else:
@@ -157,7 +780,7 @@ Executing neg_freqs.sh"
 #SBATCH -J neg_freqs
 #SBATCH -t 1:00:00
 #SBATCH -N 1
-#SBATCH --ntasks-per-node=1
+#SBATCH --ntasks-per-node={n_cores}
 
 #checks if job is running through SLURM
 if [ -n "$SLURM_JOB_ID" ]; then
@@ -166,7 +789,8 @@ if [ -n "$SLURM_JOB_ID" ]; then
     module use /project/carrow/downloads/apps/modules
     module add orca
 
-{orca_pltvib}
+n_workers=${{SLURM_NTASKS_PER_NODE:-{n_cores}}}
+{pool}
 else
     echo "Warning: Excessive negative frequencies ({len(neg_freq_info)}) detected. 
 Please run this job through SLURM with sbatch neg_freqs.sh"
@@ -179,198 +803,666 @@ fi
     return shell_file
 
 
-def process_scan(scan_data):
-    """parses through .relaxscanact.dat files and returns a table recording
-    coordinate, abs energy, rel energy, step, and type, where type can be 'edge', 'min', 'max', or ''"""
+def label_extrema(energies):
+    """returns an array labeling each scan point as 'edge', 'min', 'max', or ''
+    The first and last points are edges. Flat steps are ignored when comparing the steps on either side of a point,
+    so a plateau is labeled once, at its first point, and only if the energy rises (or falls) on both sides of it"""
 
-    # opens file and formats as a table
-    with open(scan_data, "r") as s:
-        lines = [list(map(float, line.split())) for line in s]
+    n_points = len(energies)
+    labels = np.full(n_points, '', dtype=object)
+    if n_points == 0:
+        return labels
 
-    # determines rel energy, step, and type for each line
-    # scan_min finds minimum energy in column 1
-    scan_min = min(lines, key=lambda x: x[1])[1]
-    for i in range(len(lines)):
+    # sign of each step, where sign[i] is the step from point i to i + 1
+    signs = np.sign(np.diff(energies))
 
-        # relative energy in kcal/mol
-        lines[i].append((lines[i][1] - scan_min) * 627.509)
+    # for each point, the sign of the closest non-flat step before it and the closest non-flat step from it on
+    nonflat = np.flatnonzero(signs)
+    if len(nonflat):
+        previous_index = np.searchsorted(nonflat, np.arange(n_points), side='left') - 1
+        next_index = np.searchsorted(nonflat, np.arange(n_points), side='left')
+        valid = (previous_index >= 0) & (next_index < len(nonflat))
+        before = np.zeros(n_points)
+        after = np.zeros(n_points)
+        before[valid] = signs[nonflat[previous_index[valid]]]
+        after[valid] = signs[nonflat[next_index[valid]]]
 
-        if i == 0:
-            lines[i].extend(['', 'edge'])
-        else:
-            # step - this is skipped for 0th iteration because no step taken
-            lines[i].append(lines[i][2] - lines[i-1][2])
-            # identifies local maxes and mins for previoius index
-            if i > 1:
-                if lines[i][3] <= 0 < lines[i - 1][3]:
-                    lines[i-1].append('max')
-                elif lines[i][3] >= 0 > lines[i - 1][3]:
-                    lines[i-1].append('min')
-                else:
-                    lines[i-1].append('')
-                if i == len(lines) - 1:
-                    lines[i].append('edge')
+        # only the first point of a plateau is labeled
+        first_of_plateau = np.ones(n_points, dtype=bool)
+        first_of_plateau[1:] = signs != 0
+        labels[(before > 0) & (after < 0) & first_of_plateau] = 'max'
+        labels[(before < 0) & (after > 0) & first_of_plateau] = 'min'
+
+    labels[[0, -1]] = 'edge'
+    return labels
+
+
+def process_scan(scan_data):
+    """parses through .relaxscanact.dat files and returns a table recording
+    coordinate, abs energy, rel energy, step, and type, where type can be 'edge', 'min', 'max', or ''"""
 
-    return lines
+    # opens file and formats as an array of coordinates and energies
+    data = np.loadtxt(scan_data, ndmin=2)
+    coordinates, energies = data[:, 0], data[:, 1]
+
+    # relative energy in kcal/mol and step from the previous point. The 0th point has no step
+    rel_energies = (energies - energies.min()) * 627.509
+    steps = np.diff(rel_energies)
+    labels = label_extrema(energies)
+
+    # columns are converted to python types so that the table can be cached as json
+    steps = [''] + steps.tolist()
+    return [list(line) for line in zip(coordinates.tolist(), energies.tolist(), rel_energies.tolist(), steps,
+                                       labels.tolist())]
+
+
+def natural_cubic_spline(x, y):
+    """returns the coefficients (a, b, c, d) of the natural cubic spline through the points (x, y),
+    where the spline between x[j] and x[j + 1] is a[j] + b[j]*t + c[j]*t**2 + d[j]*t**3 for t = x - x[j]"""
+
+    h = np.diff(x)
+    n_points = len(x)
+
+    # solves for the second derivatives, which are 0 at both ends of a natural spline
+    system = np.zeros((n_points, n_points))
+    rhs = np.zeros(n_points)
+    system[0, 0] = system[-1, -1] = 1
+    interior = np.arange(1, n_points - 1)
+    system[interior, interior - 1] = h[:-1]
+    system[interior, interior] = 2 * (h[:-1] + h[1:])
+    system[interior, interior + 1] = h[1:]
+    rhs[interior] = 6 * ((y[2:] - y[1:-1]) / h[1:] - (y[1:-1] - y[:-2]) / h[:-1])
+    second_derivatives = np.linalg.solve(system, rhs)
+
+    a = y[:-1]
+    b = (y[1:] - y[:-1]) / h - h * (2 * second_derivatives[:-1] + second_derivatives[1:]) / 6
+    c = second_derivatives[:-1] / 2
+    d = (second_derivatives[1:] - second_derivatives[:-1]) / (6 * h)
+    return a, b, c, d
+
+
+def refine_scan(table):
+    """fits a natural cubic spline to the scan energies and estimates the coordinate and energy of each min and max
+    between the grid points. Returns rows of [coordinate, abs energy, rel energy, '', 'spline min' or 'spline max']
+    and the barrier (the highest spline max relative to the lowest energy before it) in kcal/mol, or None"""
+
+    coordinates = np.array([line[0] for line in table])
+    energies = np.array([line[1] for line in table])
+    labels = [line[-1] for line in table]
+    if len(table) < 3 or np.any(np.diff(coordinates) == 0):
+        return [], None
+
+    a, b, c, d = natural_cubic_spline(coordinates, energies)
+    h = np.diff(coordinates)
+
+    # critical points of every interval are the roots of b + 2c*t + 3d*t**2 that lie inside the interval
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.sqrt(np.maximum(4 * c ** 2 - 12 * d * b, 0))
+        cubic_roots = np.stack([(-2 * c + root) / (6 * d), (-2 * c - root) / (6 * d)])
+        quadratic_roots = np.stack([-b / (2 * c), np.full(len(b), np.nan)])
+    roots = np.where(np.abs(d) > 1e-12, cubic_roots, quadratic_roots)
+    fraction = roots / h
+    inside = (fraction > 0) & (fraction < 1) & (4 * c ** 2 - 12 * d * b >= 0)
+    root_energies = a + b * roots + c * roots ** 2 + d * roots ** 3
+
+    rows = []
+    refined = {'min': [], 'max': []}
+    scan_min = energies.min()
+    for i, label in enumerate(labels):
+        if label not in ('min', 'max'):
+            continue
+
+        # candidates are the grid point and the critical points of the two intervals on either side of it
+        candidates = [(energies[i], coordinates[i])]
+        for j in (i - 1, i):
+            for k in range(2):
+                if inside[k, j]:
+                    candidates.append((root_energies[k, j], coordinates[j] + roots[k, j]))
+        energy, coordinate = max(candidates) if label == 'max' else min(candidates)
+
+        rows.append([float(coordinate), float(energy), float((energy - scan_min) * 627.509), '', f'spline {label}'])
+        refined[label].append((float(energy), i))
+
+    # the barrier is measured from the lowest grid point or spline min before the highest max
+    barrier = None
+    if refined['max']:
+        max_energy, max_index = max(refined['max'])
+        lowest = min([energies[:max_index].min()] + [energy for energy, i in refined['min'] if i < max_index])
+        barrier = float((max_energy - lowest) * 627.509)
+
+    return rows, barrier
 
 
 def process_allxyz(file, scan_data):
-    """modifies allxyz files to be maestro readable and contain helpful data from the scan results"""
+    """modifies allxyz files to be maestro readable and contain helpful data from the scan results
+    The file is rewritten one frame at a time, and the byte offset, length, coordinate, and type of each frame
+    in the new .all.xyz file are saved to a .all.xyz.idx file so that single frames can be read without a full pass"""
 
     if file.endswith('.allxyz'):
-        basename = file.split('.')[0]
-        with open(file, 'r') as old_file:
-            content = old_file.readlines()
-
-        # manipulates file content
-        # trivial increment of i to link logic to next section, as 0th entry has no >
-        i = 0
-        content[1] = f'{basename} {scan_data[i][0]} {scan_data[i][-1]}\n'
-        i += 1
-        for j in range(len(content)):
-            if '>' in content[j]:
-                content[j] = '\n'
-                content[j + 2] = f'{basename} {scan_data[i][0]} {scan_data[i][-1]}\n'
-                i += 1
-            j += 1
-
-        # writes the new file
+        basename = os.path.basename(file).split('.')[0]
         new_name = file.replace('.allxyz', '.all.xyz')
-        with open(new_name, 'w') as new_file:
-            new_file.writelines(content)
+
+        frames = []
+        # the new file is written as bytes so that frame offsets are exact
+        with open(file, 'r') as old_file, open(f'{new_name}.tmp', 'wb') as new_file:
+            for line in old_file:
+                # frames are separated by '>' lines, which are replaced by blank lines
+                if '>' in line:
+                    new_file.write(b'\n')
+                elif not line.strip():
+                    new_file.write(line.encode())
+
+                # otherwise, the line is the number of atoms and starts a frame, whose comment line is replaced
+                else:
+                    n_atoms = int(line)
+                    i = len(frames)
+                    offset = new_file.tell()
+                    old_file.readline()
+                    new_file.write(line.encode())
+                    new_file.write(f'{basename} {scan_data[i][0]} {scan_data[i][-1]}\n'.encode())
+                    for atom in range(n_atoms):
+                        new_file.write(old_file.readline().encode())
+                    frames.append([offset, new_file.tell() - offset, scan_data[i][0], scan_data[i][-1]])
+
+        os.replace(f'{new_name}.tmp', new_name)
+        with open(f'{new_name}.idx', 'w') as index_file:
+            json.dump({'frames': frames}, index_file)
         os.remove(file)
     else:
         print(f'Error! {file} is not a .allxyz file! Skipping file.')
 
 
-def process_out_files():
-    """Processes Orca .out files in the current directory and creates a summary CSV file.
-    Also creates a .sh file which will visualize the negative frequencies."""
+def read_frame(all_xyz, frame):
+    """returns the bytes of a single frame of a .all.xyz file using the [offset, length] from its .all.xyz.idx file"""
+    with open(all_xyz, 'rb') as f:
+        f.seek(frame[0])
+        return f.read(frame[1])
 
-    orca_outs = [entry.name for entry in os.scandir('.') if entry.name.endswith('.out')]
-    
-    # initializes results table
-    script_info = [f'This table was compiled with {os.path.basename(__file__)} and extracted from {job_name}/']
-    table_header = ['molecule name', 'command line', 'job type', 'freq?', 'cost (cpu*hr)', 'E (a.u.)',
-                    'H (a.u.)', 'G (a.u.)', 'neg freq (cm^-1)', 'geom converged?']
-    results_table = []
-    neg_freq_info = []
-    scan_data = []
 
-    for filename in orca_outs:
+def extract_frames(directory='.'):
+    """writes the min and max frames of every indexed .all.xyz file in the directory as standalone .xyz files,
+    named so that launch_orca_4 can use them directly (e.g. molecule_scanmax1_0_1.xyz)"""
+
+    n_frames = 0
+    for index_name in sorted(os.listdir(directory)):
+        if not index_name.endswith('.all.xyz.idx'):
+            continue
+        all_xyz = os.path.join(directory, index_name[:-len('.idx')])
+        molecule_name = index_name[:-len('.all.xyz.idx')]
         try:
-            with open(filename, 'r') as file:
-                inlines = file.readlines()
+            with open(os.path.join(directory, index_name), 'r') as index_file:
+                frames = json.load(index_file)['frames']
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Error with {index_name}: {e}; Skipping file.')
+            continue
+
+        # inserts the frame type and number before the charge and spin
+        parts = molecule_name.rsplit('_', 2)
+        base, suffix = (parts[0], f'_{parts[1]}_{parts[2]}') if len(parts) == 3 else (molecule_name, '')
+
+        counts = {'min': 0, 'max': 0}
+        for frame in frames:
+            frame_type = frame[3]
+            if frame_type not in counts:
+                continue
+            counts[frame_type] += 1
+            with open(os.path.join(directory, f'{base}_scan{frame_type}{counts[frame_type]}{suffix}.xyz'), 'wb') as f:
+                f.write(read_frame(all_xyz, frame))
+            n_frames += 1
 
-            # removes leading and trailing spaces
-            inlines = [line.strip() + '\n' for line in inlines]
+    print(f'{n_frames} min and max scan frames written as .xyz files.')
 
-            # skips .out files with multiple jobs and slurm .out files
-            multiple_jobs = any('$new_job' in line.lower() for line in inlines)
-            if multiple_jobs:
-                print(f'{filename} contains multiple jobs. Skipping this file.')
-                continue
-            if 'slurm' in filename:
-                continue
 
-            # slices inputs and removes the '|  #>'
-            inputs = cut_section(inlines, start='INPUT FILE\n', start_shift=-3, end='****END OF INPUT****\n')
-            for i in range(len(inputs)):
-                inputs[i] = inputs[i][inputs[i].index('>') + 2:]
-
-            # finds molecule_name, commands, ncores, freq
-            molecule_name = filename.split('.')[0]
-            commands = find_in(inputs, '!')[:-1].lower()
-            ncores = find_in(inputs, '%pal nprocs', case=False).split()[2]
-            freq = ('freq' in commands)
-
-            # determines job type
-            if find_in(inputs, '%geom scan', case=False):
-                job_type = 'scan'
-            elif 'opt' in commands:
-                job_type = 'opt'
-            elif 'optts' in commands:
-                job_type = 'optTS'
-            else:
-                job_type = 'SP'
-
-            # determines if job finished correctly and then slices results and timing accordingly
-            if inlines[-2] == '****ORCA TERMINATED NORMALLY****\n':
-                start, end = '****END OF INPUT****\n', '****ORCA TERMINATED NORMALLY****\n'
-                results = cut_section(inlines, start=start, start_shift=-3, end=end)
-                timing = inlines[-1].split()
-                days, hours, mins, secs = map(float, (timing[3], timing[5], timing[7], timing[9]))
-                cost = int(ncores) * (24*days + hours + mins/60 + secs/3600)
-            else:
-                results = cut_section(inlines, start='****END OF INPUT****\n', start_shift=-3)
-                cost = 'N/A'
+def summarize_output(output, molecule_name, directory):
+    """Summarizes a single job of an Orca .out file.
+    Returns the summary row, the scan data rows, the negative frequency info, and the database record for the job"""
 
-            if job_type == 'scan':
-                # skips most data for scans in favor of detailed scan logs
-                freq, E, H, G, neg_freqs, geom_converged = '', '', '', '', '', ''
+    scan_data = []
+    neg_freq_info = []
+    file_data = None
+    commands, job_type, freq, cost = output.commands, output.job_type, output.freq, output.cost
+
+    if job_type == 'scan':
+        # skips most data for scans in favor of detailed scan logs
+        freq, E, H, G, neg_freqs, geom_converged = '', '', '', '', '', ''
+
+        scan_file = f'{molecule_name}.relaxscanact.dat'
+        if os.path.exists(os.path.join(directory, scan_file)):
+            file_data = process_scan(os.path.join(directory, scan_file))
+
+            # manipulates corresponding .allxyz file
+            process_allxyz(os.path.join(directory, f'{molecule_name}.allxyz'), file_data)
+
+            # elaborates results table with scan data
+            scan_data.extend([[], [scan_file], ['coordinate', 'abs energy (a.u.)', 'rel energy (kcal/mol)',
+                                                'step (kcal/mol)', 'type']])
+            scan_data.extend(file_data)
+
+            # adds the spline estimates of each min and max and of the barrier
+            estimates, barrier = refine_scan(file_data)
+            if barrier is not None:
+                estimates.append(['', '', barrier, '', 'spline barrier'])
+            scan_data.extend(estimates)
+            file_data = file_data + estimates
+        else:
+            scan_data += [[f'{scan_file} does not exist'], ['']]
 
-                scan_file = f'{molecule_name}.relaxscanact.dat'
-                if os.path.exists(scan_file):
-                    file_data = process_scan(scan_file)
+    else:
+        # in the event of a job that crashed on the first SCF, E will be None
+        E = output.E
+        if freq:
+            # in the event of a crashed job, H and G will be None
+            H, G = output.H, output.G
+
+            # neg freqs is initialized even if not frequencies because empty cells are desired behavior
+            neg_freqs = []
+            if output.frequencies:
+                for mode, frequency in output.frequencies:
+                    if frequency < 0:
+                        neg_freqs.append(frequency)
+                        neg_freq_info.append([molecule_name, mode])
+        else:
+            H, G, neg_freqs = '', '', ''
 
-                    # manipulates corresponding .allxyz file
-                    process_allxyz(f'{molecule_name}.allxyz', file_data)
+        # finds geom_converged if calculation is a type of optimization
+        if job_type == 'opt' or job_type == 'optTS':
+            geom_converged = output.geom_converged
+        else:
+            geom_converged = ''
 
-                    # elaborates results table with scan data
-                    scan_data.extend([[], [scan_file], ['coordinate', 'abs energy (a.u.)', 'rel energy (kcal/mol)',
-                                                        'step (kcal/mol)', 'type']])
-                    scan_data.extend(file_data)
-                else:
-                    scan_data += [[f'{scan_file} does not exist'], ['']]
+    row = [molecule_name, commands, job_type, freq, cost, E, H, G, neg_freqs, geom_converged]
 
-            else:
-                # finds E, and if freq == True, also H, G, and neg_freqs
-                # in the event of a job that crashed on the first SCF, E will be None?
-                E = extract_energy(results, 'FINAL SINGLE POINT ENERGY', -1)
-                if freq:
-                    # in the event of a crashed job, H and G will be None
-                    H = extract_energy(results, 'Total enthalpy', -2)
-                    G = extract_energy(results, 'Final Gibbs free energy', -2)
-
-                    # in the event of a crashed job, frequencies will be None
-                    start, end = 'Writing the Hessian file to the disk', 'NORMAL MODES'
-                    frequencies = cut_section(results, start=start, start_shift=-11, end=end, end_shift=-3)
-
-                    # neg freqs is initialized even if not frequencies because empty cells are desired behavior
-                    neg_freqs = []
-                    if frequencies:
-                        for line in frequencies:
-                            frequency = float(line.split()[1])
-                            if frequency < 0:
-                                neg_freqs.append(frequency)
-                                neg_freq_info.append([molecule_name, line.split()[0][:-1]])
-                else:
-                    H, G, neg_freqs = '', '', ''
+    # the record holds the same data in the types stored by update_database()
+    record = {'molecule': molecule_name, 'commands': commands, 'charge': output.charge, 'spin': output.spin,
+              'job_type': job_type, 'freq': output.freq, 'cost': cost if cost != 'N/A' else None,
+              'E': float(E) if E else None, 'H': float(H) if H else None, 'G': float(G) if G else None,
+              'neg_freqs': neg_freqs if neg_freqs != '' else None,
+              'geom_converged': geom_converged if geom_converged != '' else None,
+              'scan': file_data}
 
-                # finds geom_converged if calculation is a type of optimization
-                if job_type == 'opt' or job_type == 'optTS':
-                    flag = '***        THE OPTIMIZATION HAS CONVERGED     ***'
-                    geom_converged = any(flag in line for line in results)
-                else:
-                    geom_converged = ''
+    return row, scan_data, neg_freq_info, record
 
-            results_table.append([molecule_name, commands, job_type, freq, cost, E, H, G, neg_freqs, geom_converged])
 
-        except (FileNotFoundError, PermissionError, IOError, ValueError, IndexError, TypeError) as e:
-            print(f'Error with {filename}: {e}; Skipping file.')
-            results_table.append([f'Error with {filename}: {e}; Skipping file.'])
+def process_out_file(filename, directory='.'):
+    """Processes a single Orca .out file in a job directory.
+    Returns the summary rows, the scan data rows, the negative frequency info, and the database records for the file,
+    with one row and record per job of multi-job files, or None if the file is skipped.
+    This is kept free of shared state so that it can run in a process pool."""
+
+    rows = []
+    scan_data = []
+    neg_freq_info = []
+    records = []
+
+    try:
+        # skips slurm .out files
+        if 'slurm' in filename:
+            return None
+
+        # reads the input block and then searches the end of the .out file for results
+        output = parse_out_file(os.path.join(directory, filename))
+
+        molecule_name = filename.split('.')[0]
+        for job in (output.subjobs if output.multiple_jobs else [output]):
+            row, job_scan_data, job_neg_freq_info, record = summarize_output(job, molecule_name, directory)
+            rows.append(row)
+            scan_data.extend(job_scan_data)
+            neg_freq_info.extend(job_neg_freq_info)
+            records.append(record)
+
+    except (FileNotFoundError, PermissionError, IOError, ValueError, IndexError, TypeError) as e:
+        print(f'Error with {filename}: {e}; Skipping file.')
+        rows = [[f'Error with {filename}: {e}; Skipping file.']]
+        records = []
+
+    return rows, scan_data, neg_freq_info, records
+
+
+def collect_results(directories, options):
+    """Processes the .out files of one or more job directories.
+    Results are cached in CACHE_FILE in each directory, so only .out files that are new or whose size
+    or modification time have changed since the last run are parsed.
+    The stale files of every directory are parsed together, either serially or in a pool of options.n_workers processes.
+    Either way, the results are merged in file name order so that both modes give identical results.
+    Returns a dictionary mapping each directory to its results table, scan data, negative frequency info,
+    and database records"""
+
+    # only parses .out files that are not in the cache or have changed since they were cached
+    # signatures are taken before parsing so that files which change during parsing are parsed again next time
+    caches = {}
+    signatures = {}
+    stale_outs = []
+    for directory in directories:
+        caches[directory] = read_cache(directory, options)
+        signatures[directory] = {filename: file_signature(os.path.join(directory, filename))
+                                 for filename in list_out_files(directory)}
+        stale_outs += [(directory, filename) for filename, signature in signatures[directory].items()
+                       if caches[directory].get(filename, {}).get('signature') != signature]
+
+    # executor.map returns results in the order of stale_outs regardless of which process finishes first
+    stale_directories = [directory for directory, filename in stale_outs]
+    stale_filenames = [filename for directory, filename in stale_outs]
+    if options.n_workers > 1 and len(stale_outs) > 1:
+        with ProcessPoolExecutor(max_workers=options.n_workers) as executor:
+            stale_results = list(executor.map(process_out_file, stale_filenames, stale_directories))
+    else:
+        stale_results = [process_out_file(filename, directory) for directory, filename in stale_outs]
+
+    # cache entries of deleted .out files are dropped
+    stale_set = set(stale_outs)
+    new_caches = {directory: {filename: caches[directory][filename] for filename in signatures[directory]
+                              if (directory, filename) not in stale_set}
+                  for directory in directories}
+    for (directory, filename), file_result in zip(stale_outs, stale_results):
+        new_caches[directory][filename] = {'signature': signatures[directory][filename], 'result': file_result}
+
+    n_outs = sum(len(directory_signatures) for directory_signatures in signatures.values())
+    print(f'{len(stale_outs)} of {n_outs} .out files parsed, the rest were unchanged since the last run.')
+
+    results = {}
+    for directory in directories:
+        write_cache(directory, new_caches[directory])
+
+        results_table = []
+        scan_data = []
+        neg_freq_info = []
+        records = []
+        for filename in signatures[directory]:
+            file_result = new_caches[directory][filename]['result']
+            if file_result is None:
+                continue
+            rows, file_scan_data, file_neg_freq_info, file_records = file_result
+            results_table.extend(rows)
+            scan_data.extend(file_scan_data)
+            neg_freq_info.extend(file_neg_freq_info)
+            records.extend(file_records)
+        results[directory] = results_table, scan_data, neg_freq_info, records
+
+    return results
+
+
+def level_of_theory(commands):
+    """returns the level of theory of a command line, which is the command line without job type keywords"""
+
+    JOB_KEYWORDS = ('!', 'sp', 'opt', 'optts', 'copt', 'zopt', 'looseopt', 'tightopt', 'verytightopt',
+                    'freq', 'numfreq', 'miniprint', 'smallprint', 'normalprint', 'largeprint')
+    return ' '.join(keyword for keyword in commands.split() if keyword not in JOB_KEYWORDS)
+
+
+def update_database(results):
+    """upserts every job in results (as returned by collect_results()) into the sqlite database DB_FILE.
+    Jobs are keyed by molecule name, command line, charge, spin, and absolute directory,
+    so rerunning process_orca_4 updates jobs instead of duplicating them.
+    Scan points are replaced whenever their job is updated."""
+
+    try:
+        connection = sqlite3.connect(DB_FILE, timeout=60)
+        with connection:
+            connection.executescript(DB_SCHEMA)
+            for directory, (results_table, scan_data, neg_freq_info, records) in results.items():
+                directory = os.path.abspath(directory)
+                for record in records:
+                    key = (record['molecule'], record['commands'], record['charge'], record['spin'], directory)
+                    neg_freqs = json.dumps(record['neg_freqs']) if record['neg_freqs'] is not None else None
+                    connection.execute(
+                        'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        key + (level_of_theory(record['commands']), record['job_type'], record['freq'],
+                               record['cost'], record['E'], record['H'], record['G'], neg_freqs,
+                               record['geom_converged'], time.strftime('%Y-%m-%d %H:%M:%S')))
+                    connection.execute('DELETE FROM scan_points WHERE molecule = ? AND command_line = ? '
+                                       'AND charge = ? AND spin = ? AND directory = ?', key)
+                    if record['scan']:
+                        connection.executemany('INSERT INTO scan_points VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                               [key + (point, *[value if value != '' else None for value in line])
+                                                for point, line in enumerate(record['scan'])])
+        connection.close()
+    except sqlite3.Error as e:
+        print(f'Warning: results could not be saved to {DB_FILE}: {e}')
+
+
+def find_job_directories(root):
+    """walks a project tree and returns every directory below root (including root) containing .out files
+    other than slurm .out files. Hidden directories and the subdirectories made by process_orca_4 are skipped"""
+
+    SKIPPED = ('inputs', 'job_files', 'scan_data')
+
+    job_directories = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(subdirectory for subdirectory in subdirectories
+                                   if not subdirectory.startswith('.') and subdirectory not in SKIPPED)
+        if any(file.endswith('.out') and 'slurm' not in file for file in files):
+            job_directories.append(os.path.relpath(directory, root))
+    return job_directories
+
+
+def directory_signature(directory):
+    """returns the names, sizes, and modification times of every .out file in a directory"""
+    return [[filename] + file_signature(os.path.join(directory, filename)) for filename in list_out_files(directory)]
+
+
+def process_campaign(options):
+    """Processes every job directory below the current directory and creates one summary CSV file for all of them.
+    Directories whose .out files are unchanged since the last crawl are not read again; their results are kept in
+    CAMPAIGN_FILE. Changed directories are processed with collect_results(), so only their changed files are parsed"""
+
+    # reads the results of the last crawl
+    campaign = {}
+    if not options.fresh and os.path.exists(CAMPAIGN_FILE):
+        try:
+            with open(CAMPAIGN_FILE, 'r') as file:
+                campaign = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            print(f'Warning: {CAMPAIGN_FILE} could not be read. Every job directory will be processed.')
+        if campaign.get('version') != version:
+            campaign = {}
+    crawled = campaign.get('directories', {})
+
+    job_directories = find_job_directories('.')
+    signatures = {directory: directory_signature(directory) for directory in job_directories}
+    changed = [directory for directory in job_directories
+               if crawled.get(directory, {}).get('signature') != signatures[directory]]
+    n_unchanged = len(job_directories) - len(changed)
+    print(f'{n_unchanged} of {len(job_directories)} job directories were unchanged since the last crawl.')
+
+    results = collect_results(changed, options) if changed else {}
+    update_database(results)
+    new_crawled = {}
+    for directory in job_directories:
+        if directory in results:
+            new_crawled[directory] = {'signature': signatures[directory], 'results': results[directory]}
+        else:
+            new_crawled[directory] = crawled[directory]
+
+    temp_file = CAMPAIGN_FILE + '.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump({'version': version, 'directories': new_crawled}, file)
+    os.replace(temp_file, CAMPAIGN_FILE)
+
+    # every row is prefixed with its job directory
+    script_info = [f'This table was compiled with {os.path.basename(__file__)} and extracted from '
+                   f'{len(job_directories)} job directories in {job_name}/']
+    table_header = ['job directory', 'molecule name', 'command line', 'job type', 'freq?', 'cost (cpu*hr)',
+                    'E (a.u.)', 'H (a.u.)', 'G (a.u.)', 'neg freq (cm^-1)', 'geom converged?']
+    results_table = []
+    scan_data = []
+    for directory in job_directories:
+        directory_table, directory_scan_data, directory_neg_freq_info, records = new_crawled[directory]['results']
+        results_table += [[directory] + row for row in directory_table]
+        if directory_scan_data:
+            scan_data += [[], [f'{directory}/']] + directory_scan_data
+
+    summary_file = f'{job_name}_campaign_summary.csv'
+    with open(summary_file, 'w', newline='') as file1:
+        writer = csv.writer(file1)
+        writer.writerows([script_info, table_header] + results_table)
+        writer.writerows(scan_data)
+    print(f'Summary file {summary_file} updated.')
+
+
+def read_composition(filename):
+    """returns the number of atoms of each element in the first CARTESIAN COORDINATES (ANGSTROEM) block
+    of an orca .out file, or None if there is none. Only the start of the memory mapped file is read"""
+
+    COORDINATES = b'CARTESIAN COORDINATES (ANGSTROEM)'
+
+    with open(filename, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = mapped.find(COORDINATES)
+            if start == -1:
+                return None
+
+            # skips the title and the dashed line below it
+            mapped.seek(start)
+            mapped.readline()
+            mapped.readline()
+            composition = {}
+            for line in iter(mapped.readline, b''):
+                parts = line.decode(errors='replace').split()
+                if len(parts) != 4:
+                    break
+                composition[parts[0]] = composition.get(parts[0], 0) + 1
+
+    return composition or None
+
+
+def read_maxcore(inputs):
+    """returns %maxcore from the input lines of a job, or None if it is not set"""
+
+    for line in inputs:
+        parts = line.lower().split()
+        if len(parts) > 1 and parts[0] == '%maxcore':
+            return int(float(parts[1]))
+    return None
+
+
+def read_scan_steps(inputs):
+    """returns the number of steps of a scan from its %geom scan line (e.g. %geom scan B 0 1 = 1.0, 1.5, 6 end end)"""
+
+    for line in inputs:
+        if line.lower().startswith('%geom scan'):
+            # launch_orca_4 may write the number of steps as a float (e.g. 6.0)
+            return int(float(line.split('=')[1].split(',')[2].split()[0]))
+    return None
+
+
+def calibration_samples(filename):
+    """returns a calibration sample for each job of an orca .out file which terminated normally.
+    Each sample holds the atom composition, command line, number of cores, %maxcore, and cost of the job,
+    as well as the number of steps of scans.
+    Also returns the number of jobs which terminated normally but whose inputs could not be read, or None in its place
+    if the file cannot be read. This is kept free of shared state so that it can run in a process pool"""
+
+    try:
+        output = parse_out_file(filename)
+        composition = read_composition(filename)
+    except (OSError, ValueError, IndexError, TypeError):
+        return [], None
+    if composition is None:
+        return [], 0
+
+    samples = []
+    n_unreadable = 0
+    maxcore = None
+    for i, job in enumerate(output.subjobs if output.multiple_jobs else [output]):
+        try:
+            # jobs of multi-job files that leave out %maxcore use that of the previous job, as orca does
+            maxcore = read_maxcore(job.inputs) or maxcore
+            if not job.terminated or job.cost == 'N/A':
+                continue
+            samples.append({'file': os.path.abspath(filename), 'job': i, 'composition': composition,
+                            'commands': job.commands, 'scan_steps': read_scan_steps(job.inputs),
+                            'ncores': int(job.ncores), 'maxcore': maxcore, 'cost': job.cost})
+        except (ValueError, IndexError, TypeError):
+            n_unreadable += 1
+    return samples, n_unreadable
+
+
+def calibrate(options):
+    """records a calibration sample (see calibration_samples()) for every job below the working directory that
+    terminated normally in COST_MODEL_FILE, which launch_orca_4 uses to predict the walltime of new jobs.
+    Samples are keyed by .out file and job, so calibrating the same directories again updates their samples"""
+
+    out_files = [os.path.join(directory, filename) for directory in find_job_directories('.')
+                 for filename in list_out_files(directory) if 'slurm' not in filename]
+
+    if options.n_workers > 1 and len(out_files) > 1:
+        with ProcessPoolExecutor(max_workers=options.n_workers) as executor:
+            file_samples = list(executor.map(calibration_samples, out_files))
+    else:
+        file_samples = [calibration_samples(filename) for filename in out_files]
+
+    # reads the samples of previous calibrations
+    model = {}
+    if os.path.exists(COST_MODEL_FILE):
+        try:
+            with open(COST_MODEL_FILE, 'r') as file:
+                model = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            print(f'Warning: {COST_MODEL_FILE} could not be read. It will be replaced.')
+        if model.get('format') != COST_MODEL_FORMAT:
+            model = {}
+    samples = model.get('samples', {})
+
+    n_new = 0
+    for samples_of_file, _ in file_samples:
+        for sample in samples_of_file:
+            samples[f"{sample['file']}:{sample['job']}"] = sample
+            n_new += 1
+
+    temp_file = COST_MODEL_FILE + '.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump({'format': COST_MODEL_FORMAT, 'samples': samples}, file)
+    os.replace(temp_file, COST_MODEL_FILE)
+
+    print(f'{n_new} finished jobs in {len(out_files)} .out files were recorded in {COST_MODEL_FILE}, '
+          f'which now holds {len(samples)} jobs.')
+
+    # reports what was left out, so that no jobs are dropped silently
+    unreadable_files = [filename for filename, (_, n_unreadable) in zip(out_files, file_samples)
+                        if n_unreadable is None]
+    n_unreadable_jobs = sum(n_unreadable for _, n_unreadable in file_samples if n_unreadable)
+    if unreadable_files:
+        print(f'Warning: {len(unreadable_files)} .out files could not be read and were skipped:')
+        for filename in unreadable_files:
+            print(f'    {filename}')
+    if n_unreadable_jobs:
+        print(f'Warning: {n_unreadable_jobs} finished jobs were skipped because their inputs could not be read.')
+
+
+def process_out_files(options):
+    """Processes Orca .out files in the current directory and creates a summary CSV file.
+    Also creates a .sh file which will visualize the negative frequencies.
+    Only new or changed .out files are parsed (see collect_results()) and the summary CSV file is updated in place."""
 
-    # writes the .csv file with results
-    available_filename = get_available_filename(f'{job_name}_summary.csv')
-    with open(available_filename, 'w', newline='') as file1:
+    # initializes results table
+    script_info = [f'This table was compiled with {os.path.basename(__file__)} and extracted from {job_name}/']
+    table_header = ['molecule name', 'command line', 'job type', 'freq?', 'cost (cpu*hr)', 'E (a.u.)',
+                    'H (a.u.)', 'G (a.u.)', 'neg freq (cm^-1)', 'geom converged?']
+    results = collect_results(['.'], options)
+    update_database(results)
+    results_table, scan_data, neg_freq_info, records = results['.']
+
+    # writes the .csv file with results, replacing the summary of any previous run
+    summary_file = f'{job_name}_summary.csv'
+    with open(summary_file, 'w', newline='') as file1:
         writer = csv.writer(file1)
         writer.writerows([script_info, table_header] + results_table)
         writer.writerows(scan_data)
-    print(f'Summary file {job_name}_summary.csv created.')
-    
+    print(f'Summary file {summary_file} updated.')
+
+    # pulls the min and max frames of scans out of the .all.xyz files
+    if options.frames:
+        extract_frames()
+
     # writes the .sh file for visualizing negative frequencies if there are any
+    # reruns which find the same negative frequencies leave neg_freqs.sh alone without asking
     if neg_freq_info:
+        shell_file = neg_freq_file(neg_freq_info, job_name)
         if os.path.exists('neg_freqs.sh'):
+            with open('neg_freqs.sh', 'r') as file2:
+                if file2.read() == shell_file:
+                    return
+
             choice = input("""Potential Error: neg_freqs.sh already exists
 Do you want to overwrite neg_freqs with new data?
 Enter 'y' to overwrite, or press any other key to exit
@@ -378,15 +1470,36 @@ Enter 'y' to overwrite, or press any other key to exit
             if choice != 'y':
                 sys.exit(0)
 
-        shell_file = neg_freq_file(neg_freq_info, job_name)
         with open(f'neg_freqs.sh', 'w') as file2:
             file2.writelines(shell_file)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) == 2:
-        if sys.argv[1] == '-v' or sys.argv[1] == '-version':
-            print(f'process_orca_4 version {version}')
-            sys.exit(0)
+    CACHE_FILE = '.process_orca_cache.json'
+    CAMPAIGN_FILE = '.process_orca_campaign.json'
+    DB_FILE = os.environ.get('CARROW_RESULTS_DB', os.path.expanduser('~/carrow_results.db'))
+    COST_MODEL_FILE = os.environ.get('CARROW_COST_MODEL', os.path.expanduser('~/.carrow_cost_model.json'))
+    COST_MODEL_FORMAT = 1
+    DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    molecule TEXT NOT NULL, command_line TEXT NOT NULL, charge, spin, directory TEXT NOT NULL,
+    level_of_theory TEXT, job_type TEXT, freq INTEGER, cost REAL, E REAL, H REAL, G REAL,
+    neg_freqs TEXT, geom_converged INTEGER, updated TEXT,
+    PRIMARY KEY (molecule, command_line, charge, spin, directory));
+CREATE INDEX IF NOT EXISTS jobs_molecule ON jobs (molecule);
+CREATE INDEX IF NOT EXISTS jobs_level_of_theory ON jobs (level_of_theory);
+CREATE TABLE IF NOT EXISTS scan_points (
+    molecule TEXT NOT NULL, command_line TEXT NOT NULL, charge, spin, directory TEXT NOT NULL, point INTEGER,
+    coordinate REAL, abs_energy REAL, rel_energy REAL, step REAL, type TEXT,
+    PRIMARY KEY (molecule, command_line, charge, spin, directory, point));
+"""
     job_name = os.path.basename(os.getcwd())
-    process_out_files()
+    options = Options(sys.argv[1:])
+    if options.triage:
+        triage_out_files()
+    elif options.calibrate:
+        calibrate(options)
+    elif options.recursive:
+        process_campaign(options)
+    else:
+        process_out_files(options)
@@ -0,0 +1,190 @@
+"""
+This script searches the sqlite database of orca results that process_orca_4 updates every time it runs.
+By default, every job matching the molecule and level of theory patterns is listed with its energies.
+Alternatively, the lowest energy job of each molecule, the scan points of scan jobs,
+or the total cost of each job directory can be listed.
+
+The database is ~/carrow_results.db unless the CARROW_RESULTS_DB environment variable is set.
+"""
+
+#####################
+###Version Control###
+#####################
+
+# (since I will probably not convince the Carrow lab to use Github)
+# Update this value whenever edits are made and add to the Edit History comment.
+
+edit_history = """
+Version Initials    Date            Summary
+1.0     ARS         16-Oct-2026     First draft. Lists jobs, lowest energy jobs, scan points, and costs from the database
+1.1     ARS         16-Oct-2026     patterns are matched case sensitively with GLOB, so _ and % are no longer wildcards
+"""
+version = edit_history.strip().split('\n')[-1].split()[0]
+
+
+import os
+import sys
+import sqlite3
+
+
+class Options(object):
+    """holds the command line options of query_orca
+    arguments are contextually interpreted, so they may be passed in any order"""
+
+    def __init__(self, arg_list):
+        self.molecule = '*'
+        self.level_of_theory = '*'
+        self.mode = 'jobs'
+
+        self.parse_args(arg_list)
+
+    @staticmethod
+    def generate_std_error(error_message=''):
+        """Standard error message and exit command"""
+        if error_message:
+            print(f'Error: {error_message}')
+        print('Usage: query_orca [molecule] [!level_of_theory] [-lowest | -scan | -cost]')
+        print('Use "query_orca -help" for the manual')
+        sys.exit(1)
+
+    def parse_args(self, arg_list):
+        """parses command line arguments. Arguments starting with ! are level of theory patterns,
+        other plaintext arguments are molecule name patterns, and * is a wildcard in either"""
+
+        molecule, level_of_theory = None, None
+        for arg in arg_list:
+            if arg.startswith('!'):
+                if level_of_theory is not None:
+                    self.generate_std_error('only one level of theory may be given')
+                level_of_theory = ' '.join(arg[1:].split()).lower()
+            elif arg.lower() in ('-l', '-lowest', '-s', '-scan', '-c', '-cost'):
+                if self.mode != 'jobs':
+                    self.generate_std_error('only one of -lowest, -scan, and -cost may be given')
+                self.mode = {'l': 'lowest', 's': 'scan', 'c': 'cost'}[arg.lower()[1]]
+            elif arg.lower() in ('-v', '-version'):
+                print(f'query_orca version {version}')
+                sys.exit(0)
+            elif arg.startswith('-'):
+                self.generate_std_error(f'{arg} not recognized')
+            else:
+                if molecule is not None:
+                    self.generate_std_error('only one molecule may be given')
+                molecule = arg
+
+        # patterns are matched case sensitively with sql GLOB, where only * is left as a wildcard
+        if molecule is not None:
+            self.molecule = escape_glob(molecule)
+        if level_of_theory is not None:
+            self.level_of_theory = escape_glob(level_of_theory)
+
+
+def escape_glob(pattern):
+    """escapes the GLOB wildcards ? and [ of a pattern by enclosing them in brackets, so that only * is a wildcard"""
+    return ''.join(f'[{char}]' if char in '?[' else char for char in pattern)
+
+
+def print_table(table):
+    # Calculate the maximum width for each column
+    column_widths = [max(len(str(item)) for item in column) for column in zip(*table)]
+
+    # Print the table with left-aligned columns
+    for row in table:
+        formatted_row = "  ".join("{:<{width}}".format(item, width=width) for item, width in zip(row, column_widths))
+        print(formatted_row)
+
+
+def format_value(value, digits=None):
+    """formats a database value for printing"""
+    if value is None:
+        return ''
+    if digits is not None and isinstance(value, float):
+        return f'{value:.{digits}f}'
+    return str(value)
+
+
+def query_jobs(connection, options):
+    """lists every matching job, or only the lowest energy job of each molecule, level of theory, charge, and spin.
+    The lowest energy job is chosen by G, or by E for jobs without a freq calculation"""
+
+    query = """SELECT molecule, level_of_theory, charge, spin, job_type, cost, E, H, G, neg_freqs, directory
+               FROM jobs WHERE molecule GLOB ? AND level_of_theory GLOB ?"""
+    if options.mode == 'lowest':
+        query = f"""SELECT * FROM ({query} AND COALESCE(G, E) IS NOT NULL) AS matches
+                    WHERE COALESCE(G, E) = (SELECT MIN(COALESCE(G, E)) FROM jobs AS other
+                                            WHERE other.molecule = matches.molecule
+                                            AND other.level_of_theory = matches.level_of_theory
+                                            AND other.charge IS matches.charge AND other.spin IS matches.spin)"""
+    query += ' ORDER BY molecule, level_of_theory, directory'
+
+    table = [['molecule', 'level of theory', 'charge', 'spin', 'job type', 'cost', 'E', 'H', 'G', 'neg freqs',
+              'directory']]
+    for row in connection.execute(query, (options.molecule, options.level_of_theory)):
+        table.append([format_value(row[0]), format_value(row[1]), format_value(row[2]), format_value(row[3]),
+                      format_value(row[4]), format_value(row[5], 2), format_value(row[6], 6),
+                      format_value(row[7], 6), format_value(row[8], 6), format_value(row[9]), format_value(row[10])])
+    return table
+
+
+def query_scans(connection, options):
+    """lists every scan point of the matching scan jobs"""
+
+    query = """SELECT jobs.molecule, jobs.level_of_theory, scan_points.coordinate, scan_points.abs_energy,
+               scan_points.rel_energy, scan_points.step, scan_points.type, jobs.directory
+               FROM jobs JOIN scan_points USING (molecule, command_line, charge, spin, directory)
+               WHERE jobs.molecule GLOB ? AND jobs.level_of_theory GLOB ?
+               ORDER BY jobs.molecule, jobs.level_of_theory, jobs.directory, scan_points.point"""
+
+    table = [['molecule', 'level of theory', 'coordinate', 'abs energy (a.u.)', 'rel energy (kcal/mol)',
+              'step (kcal/mol)', 'type', 'directory']]
+    for row in connection.execute(query, (options.molecule, options.level_of_theory)):
+        table.append([format_value(row[0]), format_value(row[1]), format_value(row[2]), format_value(row[3], 6),
+                      format_value(row[4], 2), format_value(row[5], 2), format_value(row[6]), format_value(row[7])])
+    return table
+
+
+def query_costs(connection, options):
+    """totals the cost of the matching jobs in each directory"""
+
+    query = """SELECT directory, COUNT(*), SUM(cost) FROM jobs WHERE molecule GLOB ? AND level_of_theory GLOB ?
+               GROUP BY directory ORDER BY directory"""
+
+    table = [['directory', 'jobs', 'cost (cpu*h)']]
+    total_jobs, total_cost = 0, 0.0
+    for directory, n_jobs, cost in connection.execute(query, (options.molecule, options.level_of_theory)):
+        table.append([directory, str(n_jobs), format_value(cost or 0.0, 2)])
+        total_jobs += n_jobs
+        total_cost += cost or 0.0
+    table.append(['total', str(total_jobs), f'{total_cost:.2f}'])
+    return table
+
+
+def main(options):
+    if not os.path.isfile(DB_FILE):
+        print(f'Error: {DB_FILE} does not exist. Run process_orca_4 in a job directory first.')
+        sys.exit(1)
+
+    # the database is only read, so it is opened read only
+    connection = sqlite3.connect(f'file:{DB_FILE}?mode=ro', uri=True, timeout=60)
+    try:
+        if options.mode == 'scan':
+            table = query_scans(connection, options)
+        elif options.mode == 'cost':
+            table = query_costs(connection, options)
+        else:
+            table = query_jobs(connection, options)
+    except sqlite3.Error as e:
+        print(f'Error: {DB_FILE} could not be read: {e}')
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    if len(table) == 1:
+        print('No matching jobs were found.')
+    else:
+        print_table(table)
+
+
+if __name__ == '__main__':
+    DB_FILE = os.environ.get('CARROW_RESULTS_DB', os.path.expanduser('~/carrow_results.db'))
+    options = Options(sys.argv[1:])
+    main(options)